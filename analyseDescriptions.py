@@ -1,119 +1,736 @@
+import asyncio
 import csv
 from datetime import datetime
-import json
 import os
+import random
 from pathlib import Path
-import re
 import shutil
 import time
-import instructor
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
-from google.genai import types
-from model import JobAnalysisSimple, JobAnalysisComplex
-from tenacity import retry, stop_after_attempt, wait_exponential
+from model import (JobAnalysisComplex, batch_model_for, sub_schema, field_versions, schema_tag,
+                   stale_fields)
+from extractionCache import ExtractionCache, content_key
+from jobStore import JobStore, LIST_FIELDS, description_hash
+from techTerms import canonicalize_record
+from preExtractor import PreExtractor, RULES_VERSION, merge_analysis
+from descriptionTrimmer import DescriptionTrimmer, DESCRIPTION_TOKEN_BUDGET, estimate_tokens
+from jobQueue import OffsetTracker, stream_records
 from config import QUEUE_FILE, DATABASE_FILE
-import logging
+from rateLimiter import RateLimiter
+from providerPool import ProviderPool, is_rate_limit_error
+from scheduler import JobScheduler, RunBudget
+from metrics import METRICS, Metrics
+
+MAX_RATE_LIMIT_RETRIES = 5
+# Prompt tokens we allow in one batched request before splitting it up front
+BATCH_CONTEXT_BUDGET = 30_000
+# USD per million tokens, gemini-2.5-flash-lite list price
+INPUT_COST_PER_MILLION = 0.10
+OUTPUT_COST_PER_MILLION = 0.40
+
+class BatchStats:
+    """Tallies calls and (estimated) tokens so batch sizes can be compared."""
+
+    def __init__(self):
+        self.jobs = 0
+        self.calls = 0
+        self.splits = 0
+        # Jobs that got no result, so the run knows not to checkpoint past them
+        self.failed = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started = time.perf_counter()
+
+    def report(self):
+        minutes = max(time.perf_counter() - self.started, 1e-9) / 60
+        cost = (self.input_tokens * INPUT_COST_PER_MILLION + self.output_tokens * OUTPUT_COST_PER_MILLION) / 1_000_000
+        print(f"--- Batch stats: {self.jobs} jobs, {self.calls} calls, {self.splits} splits, {self.failed} failed ---")
+        print(f"--- Throughput: {self.jobs / minutes:.1f} jobs/min ---")
+        if self.jobs:
+            print(f"--- Est. tokens/job: {(self.input_tokens + self.output_tokens) / self.jobs:.0f}, "
+                  f"est. cost/job: ${cost / self.jobs:.6f} ---")
 
 class JobDescriptionAnalyzer:
     def __init__(self, api_model_name: str = "google/gemini-2.5-flash-lite", 
-                 analysisModel: BaseModel = JobAnalysisComplex, limit = None):
-        load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is not set.")
+                 analysisModel: BaseModel = JobAnalysisComplex, limit = None,
+                 client=None, async_client=None, use_cache: bool = True,
+                 pre_extract: bool = False, trust_local_tech: bool = False,
+                 trim_descriptions: bool = True, max_description_tokens: int = DESCRIPTION_TOKEN_BUDGET,
+                 verbose: bool = True, metrics: Metrics = None, store: JobStore = None,
+                 output_format: str = "csv", dataset_dir: str = None, provider_pool: ProviderPool = None):
         self.api_model_name = api_model_name
-        self.client = instructor.from_provider(
-            self.api_model_name,
-            api_key=api_key)
+        self.api_key = None
+        # Clients can be injected (e.g. fakeProvider) to run without Gemini
+        self.client = client
+        self.async_client = async_client
+        # Routes calls across several models/keys instead of the single client, see providerPool.py
+        self.pool = provider_pool
+        if self.pool is None and self.client is None and self.async_client is None:
+            load_dotenv()
+            self.api_key = os.getenv("GEMINI_API_KEY")
+            if not self.api_key:
+                raise ValueError("GEMINI_API_KEY environment variable is not set.")
+            # instructor (and the google.genai client under it) takes over a second to import,
+            # so it's only imported once a client is actually needed
+            import instructor
+            self.client = instructor.from_provider(
+                self.api_model_name,
+                api_key=self.api_key)
         self.analysis_model = analysisModel
+        # Reposts of identical content are answered from disk instead of the LLM
+        self.use_cache = use_cache
+        self._cache = None
+        # Rules answer the easy fields locally so the LLM is only asked for the rest (or not at all)
+        self.pre_extractor = PreExtractor(trust_local_tech) if pre_extract else None
+        self.llm_calls_skipped = 0
+        # Boilerplate and repeated company blurbs are cut before prompting
+        self.trimmer = DescriptionTrimmer(max_description_tokens) if trim_descriptions else None
         self.output_file = DATABASE_FILE
+        if output_format not in ("csv", "parquet", "both"):
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.output_format = output_format
+        self.csv_fieldnames = ['id', 'title', 'company', 'location'] + list(self.analysis_model.model_fields.keys())
+        # Opened on the first row and kept open for the run
+        self.csv_file = None
+        self.csv_writer = None
+        # Parquet rows are buffered and written in part files, with native list columns
+        self.dataset_dir = dataset_dir
+        self.dataset_writer = None
+        if output_format in ("parquet", "both"):
+            # Likewise pyarrow, only once Parquet output is asked for
+            from jobDataset import DATASET_DIR, ParquetJobWriter
+            self.dataset_dir = dataset_dir or DATASET_DIR
+            self.dataset_writer = ParquetJobWriter(self.analysis_model, self.dataset_dir)
         self.input_file = QUEUE_FILE
         self.limit = limit
         self.processed_count = 0
-        self.processed_ids = set()
-        self.initProcessedIDs()
-        
-    def initProcessedIDs(self):
-        with open(self.output_file, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Skip the header row
-            next(reader, None) 
-            for row in reader:
-                if row:  # Ensure the row isn't empty
-                    # Assuming ID is the first element (index 0)
-                    self.processed_ids.add(row[0])
-        print("Current processed IDS: ", self.processed_ids)
-        
-        
-    def run_analysis_from_file(self, input_file: str = None, output_file: str = None) -> str:
+        # Opened on first use, so building an analyzer doesn't touch the database
+        self._store = store
+        # Per-field printout of every job; turn off for long runs and read the metrics instead
+        self.verbose = verbose
+        self.metrics = metrics or METRICS
+        if self.pool is not None and self.pool.metrics is None:
+            self.pool.metrics = self.metrics
+        # Time/cost caps, only set during a scheduled run
+        self.budget = None
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    @property
+    def cache(self):
+        if self._cache is None and self.use_cache:
+            self._cache = ExtractionCache()
+        return self._cache
+
+    def is_processed(self, job_id) -> bool:
+        # Near-duplicates flagged at ingest are skipped, the original carries the analysis
+        return self.store.status(job_id) in ('analysed', 'duplicate')
+
+    def _limit_reached(self, queued: int = 0) -> bool:
+        return self.limit is not None and self.processed_count + queued >= self.limit
+
+    def _set_files(self, input_file, output_file):
         if output_file != None:
             self.output_file = output_file
         if input_file != None:
             self.input_file = input_file
-        job_descriptions = self.extract_text_from_file(self.input_file)
+
+    def _offset_key(self):
+        return f"queue_offset:{os.path.abspath(self.input_file)}"
+
+    def _load_offset(self) -> int:
+        """Where the last run got to in the current queue file."""
+        offset = int(self.store.get_meta(self._offset_key()) or 0)
+        if offset > os.path.getsize(self.input_file):
+            # The queue was replaced since we last looked, start over
+            offset = 0
+        return offset
+
+    def _commit_offset(self, offset: int):
+        self.store.set_meta(self._offset_key(), offset)
+
+    def _finish_input(self, completed: bool, follow: bool):
+        # Only archive a queue we've fully drained, without failures, and nobody is still appending to.
+        # A run that had failures leaves its offset before the first one, so the next run retries them
+        if completed and self.limit == None and not follow:
+            self._archive_input()
+            self._commit_offset(0)
+        
+    def run_analysis_from_file(self, input_file: str = None, output_file: str = None,
+                               follow: bool = False, idle_timeout: float = None) -> str:
+        """
+        Streams the queue one record at a time, committing the byte offset after each job so an
+        interrupted run carries on where it stopped. With `follow`, keeps tailing the queue while
+        the scraper appends to it, until it has been idle for `idle_timeout` seconds.
+        """
+        self._set_files(input_file, output_file)
+        start_offset = self._load_offset()
         if self.limit is not None:
             print(f"--- Limit: {self.limit} jobs. Starting Analysis... ---")
         else:
-            print(f"--- Found {len(job_descriptions)} jobs. Starting Analysis... ---")
-            
-        for i, job_json in enumerate(job_descriptions):
-            if job_json['id'] not in self.processed_ids:
-                if self.limit is not None and self.processed_count >= self.limit:
-                    print(f"--- Limit of {self.limit} reached. Stopping. ---")
+            print(f"--- Streaming {self.input_file} from byte {start_offset}. Starting Analysis... ---")
+
+        completed = True
+        try:
+            for _, end, job_json in stream_records(self.input_file, start_offset, follow, idle_timeout=idle_timeout):
+                if not self.is_processed(job_json['id']):
+                    if self._limit_reached():
+                        print(f"--- Limit of {self.limit} reached. Stopping. ---")
+                        completed = False
+                        break
+                    try:
+                        with self.metrics.timer("job_seconds", mode="single"):
+                            self.process_job_description(job_json)
+                        self.processed_count += 1
+                    except Exception as e:
+                        # Same as the async path: carry on, but leave the offset before the failed job
+                        # so the next run picks it up again
+                        completed = False
+                        self.metrics.incr("jobs_failed", error=type(e).__name__)
+                        print(f"--- Failed job {job_json['id']}: {e} ---")
+                else:
+                    self.metrics.incr("jobs_skipped")
+                    if self.verbose:
+                        print(f"--- Skipping job with ID: {job_json['id']} ---")
+                if completed:
+                    self._commit_offset(end)
+        finally:
+            # Even when the run is interrupted, buffered Parquet rows and metrics are saved
+            self._end_run()
+
+        self._finish_input(completed, follow)
+        return self._output_location()
+
+    def _archive_input(self):
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        name_only = Path(self.input_file).stem
+        archive_path = f"data/archive/processed_{name_only}_{timestamp}.jsonl"
+
+        os.makedirs("data/archive", exist_ok=True)
+        shutil.move(self.input_file, archive_path)
+
+    def run_analysis_async(self, input_file: str = None, output_file: str = None, concurrency: int = 8,
+                           requests_per_minute: int = None, tokens_per_minute: int = None,
+                           follow: bool = False, idle_timeout: float = None) -> str:
+        """
+        Same as run_analysis_from_file, but keeps up to `concurrency` requests in flight
+        while staying under the provider's requests/tokens per minute quotas.
+        """
+        return asyncio.run(self._run_analysis_async(input_file, output_file, concurrency,
+                                                    requests_per_minute, tokens_per_minute,
+                                                    follow, idle_timeout))
+
+    async def _run_analysis_async(self, input_file, output_file, concurrency,
+                                  requests_per_minute, tokens_per_minute, follow=False, idle_timeout=None):
+        self._set_files(input_file, output_file)
+        start_offset = self._load_offset()
+        print(f"--- Streaming {self.input_file} from byte {start_offset}, {concurrency} jobs at a time ---")
+
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        # Bounded, so only a handful of records are ever held in memory
+        queue = asyncio.Queue(maxsize=concurrency * 2)
+        tracker = OffsetTracker(start_offset)
+        completed = True
+
+        async def producer():
+            nonlocal completed
+            records = stream_records(self.input_file, start_offset, follow, idle_timeout=idle_timeout)
+            # Workers bump processed_count as they finish, so count from where we started
+            # rather than adding the two (which counts finished jobs twice)
+            already_processed, queued = self.processed_count, 0
+            while True:
+                # The stream can block while tailing, so read it off the event loop
+                item = await asyncio.to_thread(next, records, None)
+                if item is None:
+                    break
+                start, end, job_json = item
+                if self.is_processed(job_json['id']):
+                    self.metrics.incr("jobs_skipped")
+                    self._commit_offset(tracker.done(start, end))
+                    continue
+                if self.limit is not None and already_processed + queued >= self.limit:
+                    completed = False
+                    break
+                await queue.put(item)
+                queued += 1
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def worker():
+            nonlocal completed
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                start, end, job_json = item
+                try:
+                    with self.metrics.timer("job_seconds", mode="async"):
+                        await self.process_job_description_async(job_json, limiter)
+                    self.processed_count += 1
+                except Exception as e:
+                    # One bad job shouldn't take the rest of the batch down with it. The tracker never
+                    # passes it, so the offset stays before it and the next run picks it up again
+                    completed = False
+                    self.metrics.incr("jobs_failed", error=type(e).__name__)
+                    print(f"--- Failed job {job_json['id']}: {e} ---")
+                    continue
+                self._commit_offset(tracker.done(start, end))
+
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+        self._end_run()
+
+        self._finish_input(completed, follow)
+        return self._output_location()
+    
+    def run_analysis_batched(self, input_file: str = None, output_file: str = None, batch_size: int = 10,
+                             context_budget: int = BATCH_CONTEXT_BUDGET,
+                             follow: bool = False, idle_timeout: float = None) -> str:
+        """
+        Packs `batch_size` postings into each request instead of one request per job.
+        Batches that fail validation or overflow the context are split in half and retried.
+        """
+        self._set_files(input_file, output_file)
+        start_offset = self._load_offset()
+        print(f"--- Streaming {self.input_file} from byte {start_offset} in batches of {batch_size} ---")
+
+        stats = BatchStats()
+        batch, completed = [], True
+        for _, end, job_json in stream_records(self.input_file, start_offset, follow, idle_timeout=idle_timeout):
+            if self.is_processed(job_json['id']):
+                self.metrics.incr("jobs_skipped")
+                # Once a job has failed the offset stays before it, so the next run retries it
+                if not batch and not stats.failed:
+                    self._commit_offset(end)
+                continue
+            if self._limit_reached(len(batch)):
+                completed = False
+                break
+            batch.append(job_json)
+            if len(batch) == batch_size:
+                self.process_job_batch(batch, context_budget, stats)
+                if not stats.failed:
+                    self._commit_offset(end)
+                batch = []
+        if batch:
+            self.process_job_batch(batch, context_budget, stats)
+            if completed and not stats.failed:
+                self._commit_offset(end)
+        completed = completed and not stats.failed
+        stats.report()
+        self._end_run()
+
+        self._finish_input(completed, follow)
+        return self._output_location()
+
+    def run_analysis_scheduled(self, output_file: str = None, scheduler: JobScheduler = None,
+                               max_seconds: float = None, max_cost: float = None, concurrency: int = 1,
+                               requests_per_minute: int = None, tokens_per_minute: int = None) -> str:
+        """
+        Takes queued jobs from the job store in priority order (see scheduler.py) instead of queue
+        file order, until the backlog is empty, `limit` is reached, or the run has used up
+        `max_seconds` or an estimated `max_cost` (USD). The scraper can keep adding jobs meanwhile.
+        With concurrency > 1 the jobs go through the async engine.
+        """
+        self._set_files(None, output_file)
+        scheduler = scheduler or JobScheduler(self.store)
+        self.budget = RunBudget(INPUT_COST_PER_MILLION, OUTPUT_COST_PER_MILLION, max_seconds, max_cost)
+        print(f"--- {scheduler.pending()} jobs pending, highest priority first ---")
+        if concurrency > 1:
+            asyncio.run(self._run_scheduled_async(scheduler, concurrency, requests_per_minute, tokens_per_minute))
+        else:
+            # Jobs that failed this run, so they don't come straight back to the top
+            failed = set()
+            while not self._limit_reached():
+                jobs = scheduler.next_jobs(1, exclude=failed)
+                if not jobs or not self._budget_allows(jobs[0]):
+                    break
+                try:
+                    with self.metrics.timer("job_seconds", mode="single"):
+                        self.process_job_description(jobs[0])
+                    self.processed_count += 1
+                except Exception as e:
+                    failed.add(jobs[0]['id'])
+                    self.metrics.incr("jobs_failed", error=type(e).__name__)
+                    print(f"--- Failed job {jobs[0]['id']}: {e} ---")
+        self.budget.report()
+        self.budget = None
+        self._end_run()
+        return self._output_location()
+
+    async def _run_scheduled_async(self, scheduler, concurrency, requests_per_minute, tokens_per_minute):
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        # In flight or failed; picking and claiming a job happen without an await in between
+        claimed = set()
+        in_flight = 0
+
+        async def worker():
+            nonlocal in_flight
+            while not self._limit_reached(in_flight):
+                jobs = scheduler.next_jobs(1, exclude=claimed)
+                if not jobs or not self._budget_allows(jobs[0]):
+                    return
+                job_json = jobs[0]
+                claimed.add(job_json['id'])
+                in_flight += 1
+                try:
+                    with self.metrics.timer("job_seconds", mode="async"):
+                        await self.process_job_description_async(job_json, limiter)
+                    self.processed_count += 1
+                except Exception as e:
+                    self.metrics.incr("jobs_failed", error=type(e).__name__)
+                    print(f"--- Failed job {job_json['id']}: {e} ---")
+                finally:
+                    in_flight -= 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    def _budget_allows(self, job_json) -> bool:
+        if self.budget.exhausted:
+            return False
+        prompt_tokens = estimate_tokens(self._build_messages(job_json)[0]["content"])
+        if self.budget.allows(prompt_tokens):
+            return True
+        print("--- Run budget used up. Stopping. ---")
+        return False
+
+    def run_reextraction(self, max_cost: float = None) -> int:
+        """
+        Brings stored analyses up to the current schema without redoing them from scratch. For every
+        analysed job whose field versions are out of date (see model.FIELD_VERSIONS) or that's
+        missing a field, only those fields are asked for, with a narrowed schema and the stored
+        description. The rest of the record is kept. Returns how many jobs were updated.
+        """
+        current = field_versions(self.analysis_model)
+        self.budget = RunBudget(INPUT_COST_PER_MILLION, OUTPUT_COST_PER_MILLION, max_cost=max_cost)
+        # Read everything up front, the loop writes back to the same table
+        outdated = list(self.store.outdated_extractions(current))
+        print(f"--- {len(outdated)} stored analyses are behind the current schema ---")
+        updated, field_counts = 0, {}
+        for record, stored_versions, description in outdated:
+            if self._limit_reached(updated):
+                break
+            fields = stale_fields(record, stored_versions, self.analysis_model)
+            if fields:
+                job_json = {key: record.get(key) for key in ('id', 'title', 'company', 'location')}
+                job_json['description'] = description
+                if not self._budget_allows(job_json):
                     break
-                self.process_job_description(job_json)
+                messages = self._build_messages(job_json)
+                if self.trimmer is not None:
+                    # Re-extraction doesn't store token savings, so nothing else would pop these
+                    self.trimmer.counts.pop(job_json['id'], None)
+                prompt_tokens = estimate_tokens(messages[0]["content"])
+                self._count_call("reextract", prompt_tokens)
+                try:
+                    with self.metrics.timer("llm_latency_seconds", mode="reextract"):
+                        partial, model = self._create(sub_schema(self.analysis_model, fields), messages, prompt_tokens)
+                except Exception as e:
+                    self.metrics.incr("llm_errors", mode="reextract", error=type(e).__name__)
+                    print(f"--- Failed re-extracting {record['id']}: {e} ---")
+                    continue
+                record.update(partial.model_dump())
+                canonicalize_record(record, LIST_FIELDS)
+                for field in fields:
+                    field_counts[field] = field_counts.get(field, 0) + 1
+                self.store.update_extraction(record, current, model)
+            else:
+                # Nothing to ask for (e.g. a field was dropped from the model): just record the versions
+                self.store.update_extraction(record, current)
+            updated += 1
+        self.budget.report()
+        self.budget = None
+        print(f"--- Re-extracted {updated} jobs: {field_counts} ---")
+        if field_counts:
+            # Tags, seniority, work setting and salary of updated jobs changed in place, which the
+            # cube and trends can't fold in incrementally, so both are rebuilt
+            from trends import update_aggregates
+            update_aggregates(self.store, rebuild=True)
+        if field_counts and self.dataset_writer is not None:
+            from jobDataset import export_store
+            export_store(self.store, self.analysis_model, self.dataset_dir)
+        self.metrics.export()
+        return updated
+
+    def process_job_batch(self, jobs, context_budget: int = BATCH_CONTEXT_BUDGET, stats: BatchStats = None):
+        from instructor.core import IncompleteOutputException, InstructorRetryException
+        stats = stats or BatchStats()
+        uncached = []
+        for job_json in jobs:
+            if self._store_cached_result(job_json):
                 self.processed_count += 1
+                stats.jobs += 1
             else:
-                print(f"--- Skipping job with ID: {job_json['id']} ---")
-            
-        if self.limit == None:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            name_only = Path(self.input_file).stem
-            archive_path = f"data/archive/processed_{name_only}_{timestamp}.jsonl"
-
-            os.makedirs("data/archive", exist_ok=True)
-            shutil.move(self.input_file, archive_path)
-        return self.output_file
-    
-    def extract_text_from_file(self, file_path: str) -> list[str]:
+                uncached.append(job_json)
+        jobs = uncached
+        if not jobs:
+            return
+        messages = self._build_batch_messages(jobs)
+        prompt_tokens = estimate_tokens(messages[0]["content"])
+        if prompt_tokens > context_budget and len(jobs) > 1:
+            self._split_batch(jobs, context_budget, stats)
+            return
+
+        try:
+            stats.calls += 1
+            stats.input_tokens += prompt_tokens
+            self._count_call("batch", prompt_tokens)
+            with self.metrics.timer("llm_latency_seconds", mode="batch"):
+                batch, model = self._create(batch_model_for(self.analysis_model), messages, prompt_tokens)
+        except (ValidationError, InstructorRetryException, IncompleteOutputException) as e:
+            self.metrics.incr("llm_errors", mode="batch", error=type(e).__name__)
+            if len(jobs) == 1:
+                stats.failed += 1
+                self.metrics.incr("jobs_failed", error=type(e).__name__)
+                print(f"--- Failed job {jobs[0]['id']}: {e} ---")
+                return
+            print(f"--- Batch of {len(jobs)} failed ({type(e).__name__}), splitting ---")
+            self._split_batch(jobs, context_budget, stats)
+            return
+        except Exception as e:
+            # Provider errors won't go away by splitting; leave these jobs for the next run
+            stats.failed += len(jobs)
+            self.metrics.incr("llm_errors", mode="batch", error=type(e).__name__)
+            self.metrics.incr("jobs_failed", len(jobs), error=type(e).__name__)
+            print(f"--- Batch of {len(jobs)} failed: {e} ---")
+            return
+
+        jobs_by_id = {job['id']: job for job in jobs}
+        for item in batch.results:
+            job_json = jobs_by_id.pop(item.job_id, None)
+            if job_json is None:
+                # The model invented or repeated an id; nothing to attach it to
+                continue
+            stats.output_tokens += estimate_tokens(item.model_dump_json())
+            self.metrics.incr("output_tokens_estimated", estimate_tokens(item.model_dump_json()))
+            # Already validated as part of the batch, so just drop the job_id wrapper
+            self._store_result(job_json, item.model_dump(exclude={'job_id'}), model=model)
+            self.processed_count += 1
+            stats.jobs += 1
+
+        missing = list(jobs_by_id.values())
+        if missing and len(missing) < len(jobs):
+            print(f"--- {len(missing)} jobs missing from batch response, retrying them ---")
+            self.process_job_batch(missing, context_budget, stats)
+        elif missing and len(jobs) > 1:
+            self._split_batch(missing, context_budget, stats)
+        elif missing:
+            stats.failed += 1
+            self.metrics.incr("jobs_failed", error="NoResult")
+            print(f"--- No result returned for job {missing[0]['id']} ---")
+
+    def _split_batch(self, jobs, context_budget, stats):
+        stats.splits += 1
+        self.metrics.incr("batch_splits")
+        middle = len(jobs) // 2
+        self.process_job_batch(jobs[:middle], context_budget, stats)
+        self.process_job_batch(jobs[middle:], context_budget, stats)
+
+    def _build_batch_messages(self, jobs):
+        posts = "\n\n".join(
+            f"=== JOB ID: {job['id']} ===\nJOB TITLE: {job.get('title')}\n\n{self._prompt_description(job)}"
+            for job in jobs
+        )
+        content = ("Extract tech details from each of these job posts. Return exactly one result per post, "
+                   f"with job_id set to the JOB ID shown above it:\n\n{posts}")
+        return [{"role": "user", "content": content}]
+
+    def extract_text_from_file(self, file_path: str):
         """
-        Reads a file and splits it into a list of job descriptions.
+        Lazily yields the job descriptions in a queue file, one record at a time.
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"The file '{file_path}' was not found.")
-        jobs = []
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-            # Skip empty lines to be safe
-                if line.strip(): 
-                    job = json.loads(line)
-                    jobs.append(job)
-        return jobs
+        for _, _, job in stream_records(file_path):
+            yield job
 
-    
-    # @retry(
-    #     stop=stop_after_attempt(3), 
-    #     wait=wait_exponential(multiplier=1, min=4, max=10),
-    #     before_sleep=lambda retry_state: print(f"⚠️ Retrying AI call (Attempt {retry_state.attempt_number})...")
-    # )
     def process_job_description(self, job_json ):
-        job_text_for_ai = f"JOB TITLE: {job_json.get('title')}\n\n{job_json.get('description')}"
-        
-        jsonData = self.client.create(
-            response_model=self.analysis_model,
-            messages=[{"role": "user", "content": f"Extract tech details from this job post:\n\n{job_text_for_ai}"}],
-        )
-        analysis_dict = jsonData.model_dump()
+        if self._store_cached_result(job_json):
+            return
+        resolved, response_model = self._pre_extract(job_json)
+        if response_model is None:
+            self._store_result(job_json, resolved)
+            return
+        messages = self._build_messages(job_json)
+        prompt_tokens = estimate_tokens(messages[0]["content"])
+        self._count_call("single", prompt_tokens)
+        try:
+            with self.metrics.timer("llm_latency_seconds", mode="single"):
+                jsonData, model = self._create(response_model, messages, prompt_tokens)
+        except Exception as e:
+            self.metrics.incr("llm_errors", mode="single", error=type(e).__name__)
+            raise
+        self._store_result(job_json, merge_analysis(resolved, jsonData.model_dump()), model=model)
+        #remove line from file?
+
+    async def process_job_description_async(self, job_json, limiter: RateLimiter):
+        if self._store_cached_result(job_json):
+            return
+        resolved, response_model = self._pre_extract(job_json)
+        if response_model is None:
+            self._store_result(job_json, resolved)
+            return
+        messages = self._build_messages(job_json)
+        prompt_tokens = estimate_tokens(messages[0]["content"])
+        if self.pool is not None:
+            # The pool handles 429s per endpoint, only the run-wide quota is applied here
+            with self.metrics.timer("rate_limit_wait_seconds"):
+                await limiter.acquire(prompt_tokens)
+            self._count_call("async", prompt_tokens)
+            try:
+                with self.metrics.timer("llm_latency_seconds", mode="async"):
+                    jsonData, endpoint = await self.pool.create_async(response_model, messages, prompt_tokens)
+            except Exception as e:
+                self.metrics.incr("llm_errors", mode="async", error=type(e).__name__)
+                raise
+            self._store_result(job_json, merge_analysis(resolved, jsonData.model_dump()), model=endpoint.model_label)
+            return
+        client = self._get_async_client()
+        for attempt in range(1, MAX_RATE_LIMIT_RETRIES + 1):
+            with self.metrics.timer("rate_limit_wait_seconds"):
+                await limiter.acquire(prompt_tokens)
+            self._count_call("async", prompt_tokens)
+            try:
+                with self.metrics.timer("llm_latency_seconds", mode="async"):
+                    jsonData = await client.create(
+                        response_model=response_model,
+                        messages=messages,
+                    )
+                break
+            except Exception as e:
+                self.metrics.incr("llm_errors", mode="async", error=type(e).__name__)
+                if not is_rate_limit_error(e) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self.metrics.incr("llm_retries")
+                # Back off for everyone, not just this worker - the quota is shared
+                delay = min(2 ** attempt, 60) + random.uniform(0, 1)
+                print(f"⚠️ Rate limited on {job_json['id']}, backing off {delay:.1f}s (Attempt {attempt})...")
+                limiter.penalise(delay)
+        self._store_result(job_json, merge_analysis(resolved, jsonData.model_dump()))
+
+    def _count_call(self, mode, prompt_tokens):
+        if self.budget is not None:
+            self.budget.spend(prompt_tokens)
+        self.metrics.incr("llm_calls", mode=mode)
+        self.metrics.incr("prompt_tokens_estimated", prompt_tokens)
+
+    def _pre_extract(self, job_json):
+        """
+        Returns (locally resolved fields, model to ask the LLM with). The model is None
+        when every field was answered locally and the call can be skipped.
+        """
+        if self.pre_extractor is None:
+            return {}, self.analysis_model
+        resolved, unresolved = self.pre_extractor.extract(job_json, self.analysis_model)
+        if not unresolved:
+            self.llm_calls_skipped += 1
+            self.metrics.incr("llm_calls_skipped")
+            return resolved, None
+        return resolved, sub_schema(self.analysis_model, unresolved)
+
+    def _create(self, response_model, messages, prompt_tokens):
+        """Blocking LLM call, through the provider pool when there is one. Returns (result, model that answered)."""
+        if self.pool is not None:
+            result, endpoint = self.pool.create(response_model, messages, prompt_tokens)
+            return result, endpoint.model_label
+        return self.client.create(response_model=response_model, messages=messages), self.api_model_name
+
+    def _models(self):
+        """Models whose cached answers this analyzer accepts, most preferred first."""
+        if self.pool is not None:
+            return list(dict.fromkeys(endpoint.model_label for endpoint in self.pool.endpoints))
+        return [self.api_model_name]
+
+    def _get_async_client(self):
+        if self.async_client is None:
+            import instructor
+            self.async_client = instructor.from_provider(
+                self.api_model_name,
+                api_key=self.api_key,
+                async_client=True)
+        return self.async_client
+
+    def _build_messages(self, job_json):
+        job_text_for_ai = f"JOB TITLE: {job_json.get('title')}\n\n{self._prompt_description(job_json)}"
+        return [{"role": "user", "content": f"Extract tech details from this job post:\n\n{job_text_for_ai}"}]
+
+    def _prompt_description(self, job_json):
+        if self.trimmer is None:
+            return job_json.get('description')
+        return self.trimmer.trim(job_json)
+
+    def _cache_key(self, job_json, model):
+        variant = f"{self.analysis_model.__name__}-{schema_tag(self.analysis_model)}"
+        if self.pre_extractor is not None:
+            # Pre-extracted answers differ from full LLM ones, keep them apart in the cache
+            variant += f"-pre{RULES_VERSION}" + ("-local" if self.pre_extractor.trust_local_tech else "")
+        return content_key(job_json, model, variant)
+
+    def _store_cached_result(self, job_json) -> bool:
+        """Saves the cached analysis for this content if we have one. Returns True on a hit."""
+        if self.cache is None:
+            return False
+        # Answers are cached under the model that gave them, so a pool takes any of its members'
+        keys = {self._cache_key(job_json, model): model for model in self._models()}
+        key, analysis_dict = self.cache.get_first(keys)
+        if analysis_dict is None:
+            self.metrics.incr("cache_misses")
+            return False
+        self.metrics.incr("cache_hits")
+        self._store_result(job_json, analysis_dict, from_cache=True, model=keys[key])
+        return True
+
+    def _output_location(self):
+        return self.dataset_dir if self.output_format == "parquet" else self.output_file
+
+    def _end_run(self):
+        """Flushes and closes the outputs, then prints the run's savings and latencies."""
+        if self.dataset_writer is not None:
+            self.dataset_writer.flush()
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = self.csv_writer = None
+        if self.cache is not None:
+            self.cache.report()
+        if self.trimmer is not None:
+            self.trimmer.report()
+        if self.pool is not None:
+            self.pool.report()
+        if self.pre_extractor is not None:
+            print(f"--- Pre-extractor answered {self.llm_calls_skipped} jobs without an LLM call ---")
+        self.metrics.report("llm_")
+        self.metrics.report("job_")
+        self.metrics.export()
+
+    def _store_result(self, job_json, analysis_dict, from_cache: bool = False, model: str = None):
+        # Answered locally (pre-extraction only) counts as the preferred model's
+        model = model or self._models()[0]
+        if self.cache is not None and not from_cache:
+            self.cache.put(self._cache_key(job_json, model), analysis_dict)
         final_record = {**job_json, **analysis_dict}
         if 'description' in final_record:
             del final_record['description']
+        # Cached or batched results may predate the alias list, so normalise here as well
+        canonicalize_record(final_record, LIST_FIELDS)
         
-        self._save_to_csv(final_record)
-        self._display_analysis(final_record)
-        #remove line from file?
+        with self.metrics.timer("output_write_seconds", format=self.output_format):
+            if self.output_format in ("csv", "both"):
+                self._save_to_csv(final_record)
+            if self.dataset_writer is not None:
+                self.dataset_writer.write(final_record)
+        token_counts = {}
+        if self.trimmer is not None and job_json['id'] in self.trimmer.counts:
+            # Popped once it's stored, so the trimmer doesn't hold every job of a long queue
+            token_counts[job_json['id']] = self.trimmer.counts.pop(job_json['id'])
+        with self.metrics.timer("store_write_seconds"):
+            self.store.mark_analysed([final_record], {job_json['id']: description_hash(job_json)}, token_counts,
+                                     {job_json['id']: job_json.get('description')},
+                                     field_versions(self.analysis_model), model)
+        self.metrics.incr("jobs_analysed")
+        if self.verbose:
+            self._display_analysis(final_record)
             
     def _display_analysis(self, jsonData):
         # Moves the printing logic out of the main logic path
@@ -123,29 +740,31 @@ class JobDescriptionAnalyzer:
             print(f"{BOLD}{BLUE}{display_name: <20}{RESET}: {value}")
         print("-" * 40)
         
-    def _save_to_csv(self, jsonData):
-        
-        os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
-        file_exists = os.path.isfile(self.output_file)
-        
-        fieldnames = ['id', 'title', 'company', 'location'] + list(self.analysis_model.model_fields.keys())
-
-        with open(self.output_file, 'a', newline='', encoding='utf-8') as f:
+    def _get_csv_writer(self):
+        if self.csv_file is not None and self.csv_file.name != self.output_file:
+            # Output file changed between runs
+            self.csv_file.close()
+            self.csv_file = None
+        if self.csv_file is None:
+            os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+            file_exists = os.path.isfile(self.output_file) and os.path.getsize(self.output_file) > 0
+            self.csv_file = open(self.output_file, 'a', newline='', encoding='utf-8')
             # QUOTE_MINIMAL (default) adds quotes if the data contains a comma.
-            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=self.csv_fieldnames,
+                                             quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
             if not file_exists:
-                writer.writeheader()
+                self.csv_writer.writeheader()
+        return self.csv_writer
 
-            row = jsonData.copy()
-            
-            for field in fieldnames:
-                if field in row and isinstance(row[field], list):
-                    row[field] = "; ".join(row[field]) if row[field] else ""
-
-            writer.writerow(row)
+    def _save_to_csv(self, jsonData):
+        writer = self._get_csv_writer()
+        row = {field: "; ".join(value) if isinstance(value, list) else value for field, value in jsonData.items()}
+        writer.writerow(row)
+        # Each row hits the disk before the next job starts, so a crash loses at most one job
+        self.csv_file.flush()
+        os.fsync(self.csv_file.fileno())
     
 if __name__ == "__main__":
-    #logging.basicConfig(level=logging.DEBUG)
     analyzer = JobDescriptionAnalyzer(limit=None)
     outputFile = analyzer.run_analysis_from_file()
     print(f"Analysis complete. Data saved to {outputFile}.")
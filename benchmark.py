@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from config import DATABASE_FILE
+from fakeProvider import AsyncFakeProvider, FakeProvider, lognormal_latency
+from fixtureServer import DEFAULT_JOB_FILES, load_fixture_jobs
+from jobStore import JobStore
+from metrics import Metrics
+
+BENCHMARK_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "benchmark.json")
+# A run is a regression if throughput drops, or p95 latency/peak memory grow, by more than this
+TOLERANCE = 0.2
+# Startup times are a fraction of a second, so they also have to grow by this much to count
+STARTUP_SLACK = 0.1
+ANALYZER_MODES = ("sync", "async", "batched")
+# What each main.py subcommand costs before it does any work. status/report run for real (read
+# only, against the real store); analyse/scrape are timed as the imports their handlers make.
+STARTUP_COMMANDS = {
+    "help": ["main.py", "--help"],
+    "status": ["main.py", "status"],
+    "report": ["main.py", "report"],
+    "analyse": ["-c", "import analyseDescriptions"],
+    "scrape": ["-c", "import scraper, parallelScraper"],
+}
+
+
+def _write_queue(jobs, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for job in jobs:
+            f.write(json.dumps(job) + "\n")
+
+
+def _measure(run):
+    """Runs `run()` under tracemalloc. Returns (elapsed seconds, peak MB)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        run()
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def benchmark_analyzer(mode="async", job_files=None, latency=(0.05, 0.2), error_rate=0.0, server_error_rate=0.0,
+                       concurrency=8, batch_size=10, seed=1, **analyzer_options):
+    """
+    Replays the recorded jobs through JobDescriptionAnalyzer against a fake provider, in a scratch
+    store/CSV so nothing real is touched. Returns a dict of jobs/sec, p95 latency and peak memory.
+    """
+    from analyseDescriptions import JobDescriptionAnalyzer
+
+    jobs = load_fixture_jobs(job_files)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_file = os.path.join(tmp, "queue.jsonl")
+        output_file = os.path.join(tmp, "jobs.csv")
+        _write_queue(jobs, queue_file)
+        metrics = Metrics(json_path=os.path.join(tmp, "metrics.json"))
+        provider_class = AsyncFakeProvider if mode == "async" else FakeProvider
+        fake = provider_class(latency=latency, error_rate=error_rate, server_error_rate=server_error_rate, seed=seed)
+        clients = {"async_client": fake} if mode == "async" else {"client": fake}
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"), migrate=False)
+        # A limit stops the analyzer archiving the scratch queue into data/archive
+        analyzer = JobDescriptionAnalyzer(limit=len(jobs), use_cache=False, verbose=False, metrics=metrics,
+                                          store=store, **clients, **analyzer_options)
+
+        if mode == "async":
+            run = lambda: analyzer.run_analysis_async(queue_file, output_file, concurrency=concurrency)
+        elif mode == "batched":
+            run = lambda: analyzer.run_analysis_batched(queue_file, output_file, batch_size=batch_size)
+        else:
+            run = lambda: analyzer.run_analysis_from_file(queue_file, output_file)
+        elapsed, peak_mb = _measure(run)
+        store.close()
+
+    # Per-job time isn't meaningful when a whole batch shares one call
+    latency_name = "llm_latency_seconds" if mode == "batched" else "job_seconds"
+    latency_mode = {"sync": "single", "async": "async", "batched": "batch"}[mode]
+    return {
+        "jobs": analyzer.processed_count,
+        "llm_calls": fake.calls,
+        "seconds": round(elapsed, 3),
+        "jobs_per_sec": round(analyzer.processed_count / elapsed, 3) if elapsed else 0.0,
+        "p95_latency": round(metrics.histogram(latency_name, mode=latency_mode).quantile(0.95), 4),
+        "peak_mb": round(peak_mb, 2),
+    }
+
+
+def benchmark_scraper(job_files=None, page_limit=3, use_network=True, latency=0.05, render_delay_ms=300):
+    """Drives IndeedScraper over the fixture server with a headless browser, in a scratch store/queue."""
+    from fixtureServer import serve_fixtures
+    from scraper import IndeedScraper
+    from scrapeCheckpoint import ScrapeCheckpoint
+
+    server, base_url = serve_fixtures(job_files, latency=latency, render_delay_ms=render_delay_ms)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics = Metrics(json_path=os.path.join(tmp, "metrics.json"))
+            scraper = IndeedScraper(url=f"{base_url}/jobs?q=web+developer&sort=date", page_limit=page_limit,
+                                    headless=True, use_network=use_network, verbose=False, metrics=metrics,
+                                    store=JobStore(os.path.join(tmp, "jobs.sqlite"), migrate=False),
+                                    checkpoint=ScrapeCheckpoint(os.path.join(tmp, "checkpoint.json")))
+            scraper.output_file = os.path.join(tmp, "queue.jsonl")
+            elapsed, peak_mb = _measure(lambda: scraper.run(resume=False))
+            scraper.store.close()
+    finally:
+        server.shutdown()
+
+    method = "network" if use_network else "dom"
+    saved = sum(value for (name, _), value in metrics.counters.items() if name == "scrape_jobs_saved")
+    return {
+        "jobs": saved,
+        "seconds": round(elapsed, 3),
+        "jobs_per_sec": round(saved / elapsed, 3) if elapsed else 0.0,
+        "p95_latency": round(metrics.histogram("scrape_card_seconds", method=method).quantile(0.95), 4),
+        "peak_mb": round(peak_mb, 2),
+    }
+
+
+def benchmark_startup(commands=STARTUP_COMMANDS, runs=5):
+    """Median wall time of a fresh interpreter running each command, `runs` times over."""
+    results = {}
+    for name, command in commands.items():
+        if name == "report" and not os.path.exists(os.path.join(os.path.dirname(DATABASE_FILE), "tag_stats.parquet")):
+            # Without a cached cube, report builds one, which isn't startup any more
+            results[f"startup_{name}"] = {"error": "no tag cube yet, run `python main.py report --refresh`"}
+            continue
+        times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            finished = subprocess.run([sys.executable, *command], capture_output=True, text=True)
+            times.append(time.perf_counter() - started)
+            if finished.returncode != 0:
+                results[f"startup_{name}"] = {"error": (finished.stderr.strip().splitlines() or ["failed"])[-1]}
+                break
+        else:
+            results[f"startup_{name}"] = {"seconds": round(sorted(times)[len(times) // 2], 3)}
+    return results
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """Names of the benchmarks that got slower or hungrier than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or "error" in result or "error" in before:
+            continue
+        if "jobs_per_sec" not in result:
+            # Startup timings only have a duration
+            if result["seconds"] > max(before["seconds"] * (1 + tolerance), before["seconds"] + STARTUP_SLACK):
+                regressions.append(f"{name}: {before['seconds']}s -> {result['seconds']}s")
+            continue
+        if result["jobs_per_sec"] < before["jobs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {before['jobs_per_sec']} -> {result['jobs_per_sec']} jobs/sec")
+        if result["p95_latency"] > before["p95_latency"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_latency']}s -> {result['p95_latency']}s")
+        if result["peak_mb"] > before["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak {before['peak_mb']}MB -> {result['peak_mb']}MB")
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'benchmark': <28}{'jobs': >6}{'jobs/sec': >10}{'p95 (s)': >10}{'peak MB': >10}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name: <28}  skipped: {result['error']}")
+            continue
+        if "jobs_per_sec" not in result:
+            print(f"{name: <28}{'': >6}{'': >10}{result['seconds']: >10.3f}{'': >10}  (startup, s)")
+            continue
+        print(f"{name: <28}{result['jobs']: >6}{result['jobs_per_sec']: >10.2f}"
+              f"{result['p95_latency']: >10.3f}{result['peak_mb']: >10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the analyzer and scraper.")
+    parser.add_argument("--modes", nargs="+", default=list(ANALYZER_MODES), choices=ANALYZER_MODES)
+    parser.add_argument("--files", nargs="+", default=DEFAULT_JOB_FILES, help="Queue/archive files to replay")
+    parser.add_argument("--median-latency", type=float, default=0.05, help="Fake LLM median latency (s)")
+    parser.add_argument("--p95-latency", type=float, default=0.2, help="Fake LLM p95 latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that 429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--scrape-pages", type=int, default=3, help="Fixture pages to scrape, 0 to skip")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="Times to start each main.py subcommand for the startup numbers, 0 to skip")
+    parser.add_argument("--save", action="store_true", help=f"Save the results as the baseline in {BENCHMARK_FILE}")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if anything regressed against the baseline")
+    args = parser.parse_args()
+
+    latency = lognormal_latency(args.median_latency, args.p95_latency)
+    results = {}
+    for mode in args.modes:
+        print(f"--- Benchmarking {mode} analysis ---")
+        results[f"analyse_{mode}"] = benchmark_analyzer(mode, args.files, latency, args.error_rate,
+                                                        concurrency=args.concurrency, batch_size=args.batch_size)
+    if args.scrape_pages:
+        for use_network in (True, False):
+            name = f"scrape_{'network' if use_network else 'dom'}"
+            print(f"--- Benchmarking {name} ---")
+            try:
+                results[name] = benchmark_scraper(args.files, args.scrape_pages, use_network)
+            except Exception as e:
+                # No browser installed, most likely; the analyzer numbers still stand
+                results[name] = {"error": str(e).splitlines()[0]}
+    if args.startup_runs:
+        print("--- Benchmarking CLI startup ---")
+        results.update(benchmark_startup(runs=args.startup_runs))
+    print_results(results)
+
+    baseline = {}
+    if os.path.exists(BENCHMARK_FILE):
+        with open(BENCHMARK_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = find_regressions(results, baseline)
+    for regression in regressions:
+        print(f"⚠️ Regression {regression}")
+    if args.save:
+        os.makedirs(os.path.dirname(BENCHMARK_FILE), exist_ok=True)
+        with open(BENCHMARK_FILE, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"--- Baseline saved to {BENCHMARK_FILE} ---")
+    if args.check and regressions:
+        sys.exit(1)
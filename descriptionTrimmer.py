@@ -0,0 +1,191 @@
+import hashlib
+import re
+from collections import OrderedDict
+from extractionCache import normalise_text
+from preExtractor import build_tech_automaton, SALARY_PATTERN, YEARS_PATTERN, HYBRID_PATTERN, REMOTE_PATTERN, ONSITE_PATTERN
+
+# Prompt tokens we let one description use; the highest-value paragraphs are kept first
+DESCRIPTION_TOKEN_BUDGET = 1500
+# Shorter paragraphs ("Requirements", one-line bullets) are too generic to dedupe on
+MIN_DEDUPE_CHARS = 80
+MAX_HEADING_CHARS = 60
+# Dedupe memory is least-recently-used per company, so a long queue can't grow it without limit
+MAX_DEDUPE_COMPANIES = 2000
+MAX_PARAGRAPHS_PER_COMPANY = 200
+
+# Sections that never feed a schema field
+BOILERPLATE_HEADING = re.compile(
+    r"^(?:about us|about the company|who we are|our (?:company|story|mission|values|culture)|life at\b|"
+    r"(?:our |the )?benefits|perks|what we (?:can )?offer|what's in it for you|why (?:join|work)|"
+    r"equal opportunit|diversity|eeo\b|how to apply|application process|privacy|reasonable accommodation)",
+    re.IGNORECASE)
+USEFUL_HEADING = re.compile(
+    r"^(?:responsibilit|requirement|qualification|skills|experience|about (?:the (?:job|role)|you)|"
+    r"what you|the role|your role|role|tech stack|our stack|must have|nice to have|desired|preferred|minimum|key )",
+    re.IGNORECASE)
+# Legal/recruiting paragraphs that turn up anywhere, heading or not
+BOILERPLATE_PARAGRAPH = re.compile(
+    r"equal opportunity employer|without regard to|regardless of (?:race|age|gender|sex)|"
+    r"reasonable accommodation|protected veteran|privacy (?:notice|policy)|recruitment agenc",
+    re.IGNORECASE)
+# Lines worth rescuing from a dropped section (salary in "What we offer", hybrid in "Benefits")
+KEEP_PATTERNS = [SALARY_PATTERN, YEARS_PATTERN, HYBRID_PATTERN, REMOTE_PATTERN, ONSITE_PATTERN]
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough rule of thumb, ~4 characters per token
+    return len(text) // 4 + 1
+
+
+def is_heading(line: str) -> bool:
+    if len(line) > MAX_HEADING_CHARS or len(line.split()) > 8 or line.endswith(('.', ',', ';')):
+        return False
+    name = line.rstrip(':').strip()
+    return line.endswith(':') or bool(BOILERPLATE_HEADING.match(name) or USEFUL_HEADING.match(name))
+
+
+def split_sections(text: str):
+    """
+    Splits a description into [heading, [paragraphs]] sections, paragraphs being runs of
+    non-blank lines. Text before the first heading gets a heading of None.
+    """
+    sections = [[None, []]]
+    block = []
+
+    def flush():
+        if block:
+            sections[-1][1].append("\n".join(block))
+            block.clear()
+
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            flush()
+        elif is_heading(line):
+            flush()
+            sections.append([line, []])
+        else:
+            block.append(line)
+    flush()
+    return [section for section in sections if section[0] or section[1]]
+
+
+def _has_keep_line(text: str) -> bool:
+    return any(pattern.search(text) for pattern in KEEP_PATTERNS)
+
+
+class DescriptionTrimmer:
+    """
+    Cuts a posting down to the parts that feed the analysis fields before it's sent to the LLM:
+    boilerplate sections and legal paragraphs go, as do paragraphs the same company has already
+    sent us in an earlier posting, and what's left is held to a token budget.
+    """
+
+    def __init__(self, max_tokens: int = DESCRIPTION_TOKEN_BUDGET, dedupe: bool = True):
+        self.max_tokens = max_tokens
+        self.dedupe = dedupe
+        self.automaton = build_tech_automaton()
+        # company -> {paragraph hash: id of the first job it was seen in}, both least recently used first
+        self.seen_paragraphs = OrderedDict()
+        # job id -> (tokens before, tokens after), popped by whoever stores the job
+        self.counts = {}
+        self.trimmed = self.tokens_before = self.tokens_after = 0
+
+    def trim(self, job_json) -> str:
+        """The trimmed description. Trimming the same job again gives the same text."""
+        description = job_json.get('description') or ""
+        kept = []
+        for heading, paragraphs in split_sections(description):
+            drop_section = heading is not None and BOILERPLATE_HEADING.match(heading.rstrip(':').strip())
+            useful = heading is not None and bool(USEFUL_HEADING.match(heading.rstrip(':').strip()))
+            section = []
+            for paragraph in paragraphs:
+                if drop_section or BOILERPLATE_PARAGRAPH.search(paragraph):
+                    # Keep just the lines that answer a field (salary, remote, years)
+                    paragraph = "\n".join(line for line in paragraph.splitlines() if _has_keep_line(line))
+                    if not paragraph:
+                        continue
+                elif self._seen_before(job_json, paragraph):
+                    continue
+                section.append([paragraph, self._score(paragraph, useful)])
+            if section:
+                kept.append([None if drop_section else heading, section])
+
+        trimmed = self._fit_budget(kept)
+        job_id = job_json.get('id')
+        before, after = estimate_tokens(description), estimate_tokens(trimmed)
+        if job_id not in self.counts:
+            # Batches are re-trimmed when they split, which shouldn't count twice
+            self.trimmed += 1
+            self.tokens_before += before
+            self.tokens_after += after
+        self.counts[job_id] = (before, after)
+        return trimmed
+
+    def _seen_before(self, job_json, paragraph) -> bool:
+        company = job_json.get('company')
+        if not self.dedupe or not company or company in ("Unknown", "Unknown Company"):
+            return False
+        # Anything mentioning tech or a field value stays, even when it repeats
+        if len(paragraph) < MIN_DEDUPE_CHARS or _has_keep_line(paragraph) or next(self.automaton.find(paragraph), None):
+            return False
+        key = hashlib.sha1(normalise_text(paragraph).encode("utf-8")).hexdigest()
+        seen = self.seen_paragraphs.get(company)
+        if seen is None:
+            seen = self.seen_paragraphs[company] = OrderedDict()
+            if len(self.seen_paragraphs) > MAX_DEDUPE_COMPANIES:
+                self.seen_paragraphs.popitem(last=False)
+        self.seen_paragraphs.move_to_end(company)
+        first_job = seen.setdefault(key, job_json.get('id'))
+        seen.move_to_end(key)
+        if len(seen) > MAX_PARAGRAPHS_PER_COMPANY:
+            seen.popitem(last=False)
+        return first_job != job_json.get('id')
+
+    def _score(self, paragraph, useful_section) -> int:
+        tech_hits = sum(1 for _ in self.automaton.find(paragraph))
+        return 2 * tech_hits + 2 * _has_keep_line(paragraph) + useful_section
+
+    def _fit_budget(self, sections) -> str:
+        paragraphs = [entry for _, section in sections for entry in section]
+        if self.max_tokens is not None and estimate_tokens(self._join(sections)) > self.max_tokens:
+            # Highest scoring first, earlier text winning ties, until the budget is used up
+            budget = self.max_tokens
+            for entry in sorted(paragraphs, key=lambda entry: -entry[1]):
+                cost = estimate_tokens(entry[0])
+                if cost <= budget:
+                    budget -= cost
+                elif budget > 0:
+                    entry[0] = entry[0][:budget * 4]
+                    budget = 0
+                else:
+                    entry[0] = ""
+            sections = [[heading, [entry for entry in section if entry[0]]] for heading, section in sections]
+        return self._join([section for section in sections if section[1]])
+
+    def _join(self, sections) -> str:
+        parts = []
+        for heading, section in sections:
+            body = "\n\n".join(paragraph for paragraph, _ in section)
+            parts.append(f"{heading}\n{body}" if heading else body)
+        return "\n\n".join(parts)
+
+    def report(self):
+        if not self.trimmed:
+            return
+        print(f"--- Trimmed {self.trimmed} descriptions: {self.tokens_before} -> {self.tokens_after} est. tokens "
+              f"({1 - self.tokens_after / max(self.tokens_before, 1):.0%} saved) ---")
+
+
+if __name__ == "__main__":
+    # Shows what trimming would save on the queue and archived queues
+    import glob
+    import sys
+    from jobQueue import stream_records
+
+    files = sys.argv[1:] or ["data/raw/testData.jsonl"] + sorted(glob.glob("data/archive/*.jsonl"))
+    trimmer = DescriptionTrimmer()
+    for path in files:
+        for _, _, job in stream_records(path):
+            trimmer.trim(job)
+    trimmer.report()
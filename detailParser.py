@@ -0,0 +1,107 @@
+import json
+import re
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, urlparse
+
+# The details pane is filled from a viewjob request, either JSON (spa=1) or HTML with embedded data
+DETAIL_URL_PATTERN = re.compile(r"/viewjob\?")
+INITIAL_DATA_PATTERN = re.compile(r"window\._initialData\s*=\s*(\{.*?\});\s*(?:\n|</script>)", re.DOTALL)
+BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section"}
+
+
+class _TextExtractor(HTMLParser):
+    """Roughly what inner_text gives us: tags stripped, block elements on their own lines."""
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "li":
+            self.parts.append("- ")
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    extractor = _TextExtractor()
+    extractor.feed(html or "")
+    text = "".join(extractor.parts)
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def job_id_from_url(url: str):
+    params = parse_qs(urlparse(url).query)
+    for key in ("jk", "vjk"):
+        if params.get(key):
+            return params[key][0]
+    return None
+
+
+def is_detail_response(url: str, job_id: str = None) -> bool:
+    if not DETAIL_URL_PATTERN.search(url):
+        return False
+    return job_id is None or job_id_from_url(url) == job_id
+
+
+def _find_key(data, key):
+    """Depth-first search for the first value stored under `key` anywhere in nested JSON."""
+    if isinstance(data, dict):
+        if key in data and data[key] not in (None, ""):
+            return data[key]
+        values = data.values()
+    elif isinstance(data, list):
+        values = data
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found not in (None, ""):
+            return found
+    return None
+
+
+def load_detail_payload(body: str):
+    """Parses a viewjob response body, whether it's raw JSON or an HTML page with _initialData."""
+    body = body.strip()
+    if body.startswith("{"):
+        return json.loads(body)
+    match = INITIAL_DATA_PATTERN.search(body)
+    if match:
+        return json.loads(match.group(1))
+    return None
+
+
+def parse_job_detail(body: str, job_id: str):
+    """
+    Builds the same record the DOM path scrapes, straight from the network response.
+    Returns None if the payload doesn't have a description, so the caller can fall back.
+    """
+    try:
+        payload = load_detail_payload(body)
+    except json.JSONDecodeError:
+        return None
+    if payload is None:
+        return None
+    description_html = _find_key(payload, "sanitizedJobDescription")
+    if isinstance(description_html, dict):
+        # Some variants wrap it as {"content": "<div>...</div>"}
+        description_html = description_html.get("content")
+    if not description_html:
+        return None
+    title = _find_key(payload, "jobTitle") or "Unknown Title"
+    return {
+        "id": job_id,
+        "title": title.replace("\n", " ").replace("- job post", "").strip(),
+        "company": _find_key(payload, "companyName") or "Unknown Company",
+        "location": _find_key(payload, "formattedLocation") or "Unknown Location",
+        "description": html_to_text(description_html),
+    }
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from config import DATABASE_FILE
+
+CACHE_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "extraction_cache.sqlite")
+# Evict least recently used entries once the cached JSON passes this size
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def normalise_text(text) -> str:
+    """Lowercase and collapse whitespace, so trivially re-formatted reposts hash the same."""
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+
+def content_key(job_json, model_name: str, schema_version: str) -> str:
+    parts = [
+        normalise_text(job_json.get('title')),
+        normalise_text(job_json.get('description')),
+        model_name,
+        str(schema_version),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent LLM result cache keyed on the posting's content rather than its Indeed id.
+    Values are the analysis dicts returned by the model.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def get(self, key: str):
+        return self.get_first([key])[1]
+
+    def get_first(self, keys):
+        """
+        The first of `keys` (most preferred first) that's cached, as (key, analysis dict), else
+        (None, None). Counts as one lookup however many keys it tries.
+        """
+        keys = list(keys)
+        rows = dict(self.conn.execute(f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(keys))})",
+                                      keys).fetchall())
+        key = next((key for key in keys if key in rows), None)
+        if key is None:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        self.conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return key, json.loads(rows[key])
+
+    def put(self, key: str, analysis_dict: dict):
+        value = json.dumps(analysis_dict)
+        size = len(value.encode("utf-8"))
+        old = self.conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time()))
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        # Drop the oldest entries until we're back down to 90% of the limit
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM cache ORDER BY last_used")
+        to_delete = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            to_delete.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM cache WHERE key = ?", to_delete)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        print(f"--- Cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+              f"{self.total_bytes / 1024:.0f} KB stored ---")
+
+    def close(self):
+        self.conn.close()
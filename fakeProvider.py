@@ -0,0 +1,146 @@
+import asyncio
+import math
+import random
+import re
+import time
+import typing
+from typing import List, Literal, get_args, get_origin
+
+from pydantic import BaseModel
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the 429 the real provider returns when a quota is exhausted."""
+    status_code = 429
+
+    def __init__(self, message="429 RESOURCE_EXHAUSTED (fake provider)"):
+        super().__init__(message)
+
+
+class FakeServerError(Exception):
+    """A 5xx from the provider: not a quota problem, so it isn't retried."""
+    status_code = 500
+
+    def __init__(self, message="500 INTERNAL (fake provider)"):
+        super().__init__(message)
+
+
+def lognormal_latency(median: float, p95: float):
+    """
+    A long-tailed latency distribution (what real LLM APIs look like), for FakeProvider's `latency`.
+    Returns a function of the provider's Random.
+    """
+    sigma = math.log(p95 / median) / 1.645
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def _fake_value(annotation):
+    """Builds a placeholder value that satisfies a field annotation."""
+    origin = get_origin(annotation)
+    if origin is Literal:
+        # Our Literals all end with the 'Unknown' option
+        return get_args(annotation)[-1]
+    if origin in (list, List):
+        return []
+    if origin is typing.Union:
+        # Optional[...] -> None
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return None
+    if annotation is str:
+        return "Unknown"
+    if annotation in (int, float):
+        return 0
+    return None
+
+
+def build_fake_response(response_model, messages=None, **overrides):
+    values = {name: _fake_value(field.annotation) for name, field in response_model.model_fields.items()}
+    for name, field in response_model.model_fields.items():
+        # Batch responses: echo one item back for every JOB ID in the prompt
+        item_model = (get_args(field.annotation) or [None])[0]
+        if (get_origin(field.annotation) in (list, List) and isinstance(item_model, type)
+                and issubclass(item_model, BaseModel) and "job_id" in item_model.model_fields and messages):
+            job_ids = re.findall(r"JOB ID: (\S+) ===", messages[-1]["content"])
+            values[name] = [build_fake_response(item_model, job_id=job_id) for job_id in job_ids]
+    values.update(overrides)
+    return response_model.model_construct(**values)
+
+
+class FakeProvider:
+    """
+    Local stand-in for the instructor client. Sleeps for a random latency and
+    fails with a 429 at `error_rate` (or a 500 at `server_error_rate`), so the pipeline
+    can be exercised offline. `latency` is a (min, max) range for a uniform draw, or a
+    function of a Random such as lognormal_latency(0.5, 2.0).
+    """
+
+    def __init__(self, latency=(0.2, 0.8), error_rate=0.0, seed=None, responder=None, server_error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.random = random.Random(seed)
+        self.responder = responder or build_fake_response
+        self.calls = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+
+    def _next_outcome(self):
+        self.calls += 1
+        if callable(self.latency):
+            delay = max(0.0, self.latency(self.random))
+        else:
+            delay = self.random.uniform(*self.latency)
+        roll = self.random.random()
+        if roll < self.error_rate:
+            self.rate_limited += 1
+            return delay, FakeRateLimitError()
+        if roll < self.error_rate + self.server_error_rate:
+            self.server_errors += 1
+            return delay, FakeServerError()
+        return delay, None
+
+    def create(self, response_model, messages, **kwargs):
+        delay, error = self._next_outcome()
+        time.sleep(delay)
+        if error:
+            raise error
+        return self.responder(response_model, messages)
+
+
+class AsyncFakeProvider(FakeProvider):
+    """Async flavour of FakeProvider, matching instructor's async client."""
+
+    async def create(self, response_model, messages, **kwargs):
+        delay, error = self._next_outcome()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self.responder(response_model, messages)
+
+
+if __name__ == "__main__":
+    # Quick offline run of the async engine against the test data. The fake answers go to a
+    # scratch store, metrics file and no cache, so they can't be mistaken for real extractions
+    import os
+    import sys
+    import tempfile
+    from analyseDescriptions import JobDescriptionAnalyzer
+    from jobStore import JobStore
+    from metrics import Metrics
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "data/raw/testData.jsonl"
+    os.makedirs("data/processed", exist_ok=True)
+    handle, output_file = tempfile.mkstemp(prefix="fake_", suffix=".csv", dir="data/processed")
+    os.close(handle)
+    fake = AsyncFakeProvider(latency=(0.1, 0.5), error_rate=0.2, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "jobs.sqlite"), migrate=False)
+        analyzer = JobDescriptionAnalyzer(async_client=fake, limit=10_000, use_cache=False, store=store,
+                                          metrics=Metrics(json_path=os.path.join(tmp, "metrics.json")))
+        start = time.perf_counter()
+        analyzer.run_analysis_async(input_file, output_file, concurrency=8, requests_per_minute=600)
+        elapsed = time.perf_counter() - start
+        store.close()
+    print(f"--- {analyzer.processed_count} jobs in {elapsed:.1f}s, "
+          f"{fake.calls} calls, {fake.rate_limited} fake 429s. Output: {output_file} ---")
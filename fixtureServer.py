@@ -0,0 +1,144 @@
+import glob
+import html
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+TEMPLATE_FILE = "data/fixtures/indeed_search.html"
+DEFAULT_JOB_FILES = ["data/raw/testData.jsonl"] + sorted(glob.glob("data/archive/*.jsonl"))
+RESULTS_PER_PAGE = 10
+
+
+def load_fixture_jobs(job_files=None):
+    jobs, seen = [], set()
+    for path in job_files or DEFAULT_JOB_FILES:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                job = json.loads(line)
+                if job.get("id") and job["id"] not in seen:
+                    seen.add(job["id"])
+                    jobs.append(job)
+    return jobs
+
+
+def description_to_html(description):
+    paragraphs = [p.strip() for p in (description or "").split("\n") if p.strip()]
+    return "".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)
+
+
+def detail_payload(job):
+    """The shape of Indeed's viewjob?spa=1 response, trimmed to what detailParser reads."""
+    return {
+        "body": {
+            "jobInfoWrapperModel": {
+                "jobInfoModel": {
+                    "jobInfoHeaderModel": {
+                        "jobTitle": job.get("title"),
+                        "companyName": job.get("company"),
+                        "formattedLocation": job.get("location"),
+                    },
+                    "sanitizedJobDescription": description_to_html(job.get("description")),
+                }
+            }
+        }
+    }
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves recorded jobs as Indeed-like search pages plus viewjob JSON."""
+    jobs = []
+    jobs_by_id = {}
+    template = ""
+    latency = 0.0
+    render_delay_ms = 300
+
+    def do_GET(self):
+        parts = urlparse(self.path)
+        params = parse_qs(parts.query)
+        if parts.path == "/jobs":
+            self._send(200, "text/html", self._search_page(params))
+        elif parts.path == "/viewjob":
+            job = self.jobs_by_id.get((params.get("jk") or [None])[0])
+            if job is None:
+                self._send(404, "application/json", "{}")
+                return
+            # Simulated server time for the details request
+            time.sleep(self.latency)
+            self._send(200, "application/json", json.dumps(detail_payload(job)))
+        else:
+            self._send(404, "text/plain", "Not found")
+
+    def _search_page(self, params):
+        start = int((params.get("start") or ["0"])[0])
+        query = {key: values[0] for key, values in params.items() if key not in ("start", "vjk")}
+        cards = "\n".join(
+            f'<div class="job_seen_beacon" data-jk="{job["id"]}"><a data-jk="{job["id"]}">'
+            f'{html.escape(job.get("title") or "")}</a><div>{html.escape(job.get("company") or "")}</div></div>'
+            for job in self.jobs[start:start + RESULTS_PER_PAGE]
+        ) or '<div class="jobsearch-NoResult-messageContainer">The search did not match any jobs.</div>'
+        next_link = ""
+        if start + RESULTS_PER_PAGE < len(self.jobs):
+            next_url = "/jobs?" + urlencode({**query, "start": start + RESULTS_PER_PAGE})
+            next_link = f'<a data-testid="pagination-page-next" href="{next_url}">Next</a>'
+        return (self.template
+                .replace("{{QUERY}}", html.escape(query.get("q", "")))
+                .replace("{{SORT_URL}}", "/jobs?" + urlencode({**query, "sort": "date"}))
+                .replace("{{CARDS}}", cards)
+                .replace("{{NEXT_LINK}}", next_link)
+                .replace("{{RENDER_DELAY_MS}}", str(self.render_delay_ms)))
+
+    def _send(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures(job_files=None, port=0, latency=0.0, render_delay_ms=300):
+    """Starts the fixture server on a background thread. Returns (server, base_url)."""
+    jobs = load_fixture_jobs(job_files)
+    with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+        template = f.read()
+    handler = type("BoundFixtureHandler", (FixtureHandler,), {
+        "jobs": jobs,
+        "jobs_by_id": {job["id"]: job for job in jobs},
+        "template": template,
+        "latency": latency,
+        "render_delay_ms": render_delay_ms,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    # Compares the network and DOM extraction paths against the same local pages
+    import tempfile
+    import os
+    from jobStore import JobStore
+    from metrics import Metrics
+    from scrapeCheckpoint import ScrapeCheckpoint
+    from scraper import IndeedScraper
+
+    server, base_url = serve_fixtures(latency=0.05)
+    print(f"--- Serving fixtures at {base_url} ---")
+    for use_network in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            scraper = IndeedScraper(url=f"{base_url}/jobs?q=web+developer&sort=date", page_limit=3,
+                                    headless=True, use_network=use_network,
+                                    store=JobStore(os.path.join(tmp, "jobs.sqlite"), migrate=False),
+                                    metrics=Metrics(json_path=os.path.join(tmp, "metrics.json")),
+                                    checkpoint=ScrapeCheckpoint(os.path.join(tmp, "checkpoint.json")))
+            scraper.output_file = os.path.join(tmp, "queue.jsonl")
+            print(f"\n=== {'network' if use_network else 'DOM'} extraction ===")
+            scraper.run()
+    server.shutdown()
@@ -0,0 +1,143 @@
+import glob
+import os
+import shutil
+import time
+import typing
+from typing import List, Literal, get_args, get_origin
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pydantic import BaseModel
+from config import DATABASE_FILE
+
+# Parquet part files written by the analyzer, one per flushed batch
+DATASET_DIR = os.path.join(os.path.dirname(DATABASE_FILE), "jobs_dataset")
+FLUSH_ROWS = 500
+BASE_COLUMNS = ['id', 'title', 'company', 'location']
+
+
+def arrow_type(annotation):
+    """Arrow column type for a pydantic field annotation. Lists stay real list columns."""
+    origin = get_origin(annotation)
+    if origin is typing.Union:
+        # Optional[X] -> X, arrow columns are all nullable
+        return arrow_type(next(arg for arg in get_args(annotation) if arg is not type(None)))
+    if origin in (list, List):
+        return pa.list_(arrow_type((get_args(annotation) or [str])[0]))
+    if origin is Literal:
+        return pa.string()
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct([(name, arrow_type(field.annotation)) for name, field in annotation.model_fields.items()])
+    if annotation is int:
+        return pa.int64()
+    if annotation is float:
+        return pa.float64()
+    if annotation is bool:
+        return pa.bool_()
+    return pa.string()
+
+
+def _coerce(value, column_type):
+    """Fits older records (e.g. migrated from the CSV, where everything is a string) to the column type."""
+    if value is None or value == "":
+        return None
+    if pa.types.is_list(column_type):
+        if isinstance(value, str):
+            value = [part.strip() for part in value.split(";") if part.strip()]
+        return [str(item) for item in value] if isinstance(value, (list, tuple)) else None
+    if pa.types.is_struct(column_type):
+        return value if isinstance(value, dict) else None
+    if pa.types.is_integer(column_type) or pa.types.is_floating(column_type):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(number) if pa.types.is_integer(column_type) else number
+    if pa.types.is_boolean(column_type):
+        return bool(value)
+    return str(value)
+
+
+def schema_for(analysis_model) -> pa.Schema:
+    fields = [(name, pa.string()) for name in BASE_COLUMNS]
+    fields += [(name, arrow_type(field.annotation)) for name, field in analysis_model.model_fields.items()]
+    return pa.schema(fields)
+
+
+class ParquetJobWriter:
+    """
+    Buffers analysed records and writes them out as Parquet part files of `flush_rows` rows.
+    Parts are written under a temporary name and renamed, so readers never see half a file.
+    Rows still in the buffer when the process dies are lost here, but are safe in the job store
+    (export_store rebuilds the dataset from it).
+    """
+
+    def __init__(self, analysis_model, path: str = DATASET_DIR, flush_rows: int = FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.schema = schema_for(analysis_model)
+        self.buffer = []
+        self.parts_written = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def write(self, record: dict):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        columns = {field.name: [_coerce(record.get(field.name), field.type) for record in self.buffer]
+                   for field in self.schema}
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        tmp_path = os.path.join(self.path, "." + name + ".tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self.parts_written += 1
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def dataset_exists(path: str = DATASET_DIR) -> bool:
+    return bool(glob.glob(os.path.join(path, "*.parquet")))
+
+
+def read_table(path: str = DATASET_DIR, columns=None, filter=None) -> pa.Table:
+    """
+    Reads just `columns` from the dataset (all of them if None) as an Arrow table.
+    Only the projected column chunks are decoded, and `filter` (a pyarrow.dataset expression,
+    e.g. ds.field('work_setting') == 'Remote') is pushed down to the row groups.
+    """
+    dataset = ds.dataset(path, format="parquet")
+    columns = [name for name in columns if name in dataset.schema.names] if columns else None
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def read_columns(path: str = DATASET_DIR, columns=None, filter=None):
+    """Same as read_table, as a pandas frame (list columns come back as arrays)."""
+    return read_table(path, columns, filter).to_pandas()
+
+
+def export_store(store, analysis_model, path: str = DATASET_DIR, flush_rows: int = 50_000):
+    """Rebuilds the dataset from every analysed record in the job store."""
+    tmp_dir = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    writer = ParquetJobWriter(analysis_model, tmp_dir, flush_rows)
+    count = 0
+    for record in store.analysed_records():
+        writer.write(record)
+        count += 1
+    writer.close()
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_dir, path)
+    print(f"--- Exported {count} jobs to {path} in {writer.parts_written} parts ---")
+
+
+if __name__ == "__main__":
+    from jobStore import JobStore
+    from model import JobAnalysisComplex
+    export_store(JobStore(), JobAnalysisComplex)
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+
+
+def append_record(file_handle, record):
+    """Appends one JSON line and forces it to disk, so a crash can't leave half a record behind."""
+    file_handle.write(json.dumps(record) + "\n")
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+
+
+def repair_queue(path):
+    """
+    Truncates a torn last line left by a crash mid-write.
+    Returns the number of bytes dropped (0 if the file was already clean).
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return 0
+        # Walk back to the last newline; anything after it is an unfinished record
+        position = size
+        chunk = 4096
+        while position > 0:
+            read_from = max(0, position - chunk)
+            f.seek(read_from)
+            data = f.read(position - read_from)
+            newline = data.rfind(b"\n")
+            if newline != -1:
+                last_good = read_from + newline + 1
+                break
+            position = read_from
+        else:
+            last_good = 0
+
+        if last_good == size:
+            return 0
+        f.seek(last_good)
+        tail = f.read()
+        try:
+            json.loads(tail)
+            # A complete record that's just missing its newline
+            f.write(b"\n")
+            return 0
+        except ValueError:
+            f.truncate(last_good)
+            print(f"--- Dropped {size - last_good} bytes of a partial record from {path} ---")
+            return size - last_good
+
+
+def stream_records(path, offset=0, follow=False, poll_interval=1.0, idle_timeout=None):
+    """
+    Yields (start_offset, end_offset, record) for each complete JSON line from `offset` on.
+    With `follow`, keeps tailing the file as the scraper appends to it, until nothing new
+    has arrived for `idle_timeout` seconds (forever if None).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"The file '{path}' was not found.")
+    with open(path, "rb") as f:
+        f.seek(offset)
+        # Spans run from the end of the previous record, so skipped lines never leave gaps
+        span_start = offset
+        idle_since = time.monotonic()
+        while True:
+            start = f.tell()
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                if line.strip() and not follow:
+                    # A finished file whose last line just lacks a newline
+                    line += b"\n"
+                else:
+                    # End of file, or a line the writer hasn't finished yet - leave it for later
+                    f.seek(start)
+                    if not follow:
+                        return
+                    if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+            idle_since = time.monotonic()
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"--- Skipping unreadable queue line at byte {start} ---")
+                continue
+            yield span_start, f.tell(), record
+            span_start = f.tell()
+
+
+class OffsetTracker:
+    """
+    Works out how far into the queue it's safe to checkpoint when records finish out of order.
+    The committed offset only moves past a record once everything before it is done too.
+    """
+
+    def __init__(self, offset=0):
+        self.committed = offset
+        self.finished = {}
+
+    def done(self, start, end):
+        """Marks one record finished. Returns the new committed offset."""
+        self.finished[start] = end
+        while self.committed in self.finished:
+            self.committed = self.finished.pop(self.committed)
+        return self.committed
@@ -0,0 +1,399 @@
+import ast
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from config import QUEUE_FILE, DATABASE_FILE
+from extractionCache import normalise_text
+
+STORE_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "jobs.sqlite")
+ARCHIVE_DIR = "data/archive"
+# Columns added after the first release, with their types, so older stores can be upgraded in place
+ADDED_COLUMNS = {'tokens_before': 'INTEGER', 'tokens_after': 'INTEGER', 'duplicate_of': 'TEXT',
+                 'description': 'BLOB', 'query': 'TEXT', 'priority': 'REAL',
+                 'field_versions': 'TEXT', 'model_name': 'TEXT', 'last_seen': 'REAL'}
+# Archived queues are named processed_<queue>_YYYY-MM-DD_HH-MM.jsonl by the analyzer
+ARCHIVE_TIME_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})(?:_(\d{2})-(\d{2}))?\.jsonl$")
+# Columns the CSV flattens into "; " separated strings
+LIST_FIELDS = ['languages', 'frameworks', 'tools', 'cloud_platforms', 'domain_knowledge']
+# CSV columns that come back as text but are stored as numbers
+INT_FIELDS = ['min_years_experience']
+
+
+def description_hash(job_json) -> str:
+    return hashlib.sha256(normalise_text(job_json.get('description')).encode("utf-8")).hexdigest()
+
+
+def compress_description(text):
+    # Descriptions are mostly repeated prose, zlib gets them to roughly a third
+    return zlib.compress(text.encode("utf-8"), 6) if text else None
+
+
+def decompress_description(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob else None
+
+
+class JobStore:
+    """
+    Indexed record of every job we've seen, shared by the scraper, analyzer and visualiser.
+    A job is 'queued' once scraped and 'analysed' once its extraction has been saved, along with
+    the field versions (see model.FIELD_VERSIONS) and model it was extracted with.
+    Near-duplicates of a job we already have are stored as 'duplicate', pointing at the original.
+    """
+
+    def __init__(self, path: str = STORE_FILE, migrate: bool = True):
+        self.path = path
+        store_dir = os.path.dirname(self.path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        # WAL lets the scraper write while the analyzer/visualiser read
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    desc_hash TEXT,
+                    title TEXT,
+                    company TEXT,
+                    location TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    record TEXT,
+                    first_seen REAL,
+                    analysed_at REAL
+                )""")
+            existing = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_duplicate_of ON jobs (duplicate_of)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_desc_hash ON jobs (desc_hash)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_analysed_at ON jobs (analysed_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_priority ON jobs (status, priority)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if migrate and self.get_meta("migrated") is None:
+            self.migrate_from_files()
+        if migrate and self.get_meta("descriptions_backfilled") is None:
+            # Stores from before descriptions were kept: recover them from the archived queues
+            filled = sum(self.fill_descriptions(_read_jsonl(path))
+                         for path in sorted(glob.glob(os.path.join(ARCHIVE_DIR, "*.jsonl"))))
+            self.set_meta("descriptions_backfilled", time.time())
+            print(f"--- Stored descriptions for {filled} jobs from {ARCHIVE_DIR} ---")
+        if migrate and self.get_meta("seen_backfilled") is None:
+            # Stores migrated before archives were dated have all their history in the migration week
+            dated = self.backfill_seen_times()
+            self.set_meta("seen_backfilled", time.time())
+            if dated:
+                self.reset_watermarks()
+                print(f"--- Dated {dated} jobs from their archive names ---")
+        if migrate and self.get_meta("migrated_types_fixed") is None:
+            # Stores migrated before the CSV's salary and numbers were parsed hold them as text
+            fixed = [_parse_csv_row(record) for record in list(self.analysed_records())
+                     if any(isinstance(record.get(field), str) for field in INT_FIELDS + ['salary'])]
+            self.update_records(fixed)
+            self.set_meta("migrated_types_fixed", time.time())
+            if fixed:
+                self.reset_watermarks()
+                print(f"--- Restored salary and experience of {len(fixed)} migrated jobs ---")
+
+    # --- Lookups ---
+
+    def has_job(self, job_id) -> bool:
+        return self.conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is not None
+
+    def is_analysed(self, job_id) -> bool:
+        row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row[0] == 'analysed'
+
+    def status(self, job_id):
+        row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def duplicate_of(self, job_id):
+        row = self.conn.execute("SELECT duplicate_of FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def description(self, job_id):
+        row = self.conn.execute("SELECT description FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return decompress_description(row[0]) if row else None
+
+    def has_description(self, desc_hash) -> bool:
+        return self.conn.execute("SELECT 1 FROM jobs WHERE desc_hash = ? LIMIT 1", (desc_hash,)).fetchone() is not None
+
+    def counts(self) -> dict:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def analysed_records(self):
+        """Yields every analysed record as a dict, lists intact."""
+        for (record,) in self.conn.execute("SELECT record FROM jobs WHERE status = 'analysed' AND record IS NOT NULL"):
+            yield json.loads(record)
+
+    def analysed_since(self, watermark: float = 0):
+        """
+        Yields (record, first_seen, analysed_at) for jobs analysed after `watermark`, oldest first.
+        Jobs flagged as near-duplicates are left out, so a reposted job only counts once.
+        """
+        rows = self.conn.execute(
+            "SELECT record, first_seen, analysed_at FROM jobs "
+            "WHERE status = 'analysed' AND record IS NOT NULL AND analysed_at > ? AND duplicate_of IS NULL "
+            "ORDER BY analysed_at",
+            (watermark,))
+        for record, first_seen, analysed_at in rows:
+            yield json.loads(record), first_seen, analysed_at
+
+    def outdated_extractions(self, field_versions):
+        """
+        Yields (record, stored field versions, description) for analysed jobs whose field versions
+        aren't the current ones and whose description we still have.
+        """
+        rows = self.conn.execute(
+            "SELECT record, field_versions, description FROM jobs "
+            "WHERE status = 'analysed' AND record IS NOT NULL AND description IS NOT NULL "
+            "AND (field_versions IS NULL OR field_versions != ?)",
+            (json.dumps(field_versions, sort_keys=True),))
+        for record, versions, blob in rows:
+            yield json.loads(record), json.loads(versions) if versions else None, decompress_description(blob)
+
+    def token_savings(self):
+        """(jobs, tokens before trimming, tokens after) over every job whose prompt was trimmed."""
+        return self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens_before), 0), COALESCE(SUM(tokens_after), 0) "
+            "FROM jobs WHERE tokens_before IS NOT NULL").fetchone()
+
+    # --- Writes ---
+
+    def add_queued(self, jobs):
+        """
+        Bulk-inserts scraped jobs in one transaction, with their descriptions compressed so the
+        scheduler can hand them to the analyzer. Jobs we already know only get a missing
+        description or search query filled in.
+        """
+        now = time.time()
+        rows = [(job['id'], description_hash(job), job.get('title'), job.get('company'), job.get('location'), now,
+                 now, compress_description(job.get('description')), job.get('query'))
+                for job in jobs]
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO jobs (id, desc_hash, title, company, location, status, first_seen, last_seen,
+                                  description, query)
+                VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    description = COALESCE(jobs.description, excluded.description),
+                    query = COALESCE(jobs.query, excluded.query)""", rows)
+
+    def mark_analysed(self, records, desc_hashes=None, token_counts=None, descriptions=None,
+                      field_versions=None, model_name=None):
+        """
+        Bulk-saves analysed records. `desc_hashes` maps id -> hash where the description is known,
+        `token_counts` maps id -> (tokens before, tokens after) where the prompt was trimmed, and
+        `descriptions` maps id -> raw description, kept compressed for later re-extraction.
+        `field_versions` and `model_name` describe the extraction and apply to every record.
+        """
+        now = time.time()
+        desc_hashes = desc_hashes or {}
+        token_counts = token_counts or {}
+        descriptions = descriptions or {}
+        versions = json.dumps(field_versions, sort_keys=True) if field_versions else None
+        rows = [(record['id'], desc_hashes.get(record['id']), record.get('title'), record.get('company'),
+                 record.get('location'), json.dumps(record), now, now,
+                 *token_counts.get(record['id'], (None, None)),
+                 compress_description(descriptions.get(record['id'])), versions, model_name)
+                for record in records]
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO jobs (id, desc_hash, title, company, location, status, record, first_seen, analysed_at,
+                                  tokens_before, tokens_after, description, field_versions, model_name)
+                VALUES (?, ?, ?, ?, ?, 'analysed', ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    desc_hash = COALESCE(excluded.desc_hash, jobs.desc_hash),
+                    status = 'analysed',
+                    record = excluded.record,
+                    analysed_at = excluded.analysed_at,
+                    tokens_before = COALESCE(excluded.tokens_before, jobs.tokens_before),
+                    tokens_after = COALESCE(excluded.tokens_after, jobs.tokens_after),
+                    description = COALESCE(excluded.description, jobs.description),
+                    field_versions = excluded.field_versions,
+                    model_name = excluded.model_name""", rows)
+
+    def mark_duplicate(self, job, original_id):
+        """Records `job` as a near-duplicate of `original_id`. Already analysed jobs keep their status."""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO jobs (id, desc_hash, title, company, location, status, first_seen, duplicate_of)
+                VALUES (?, ?, ?, ?, ?, 'duplicate', ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    duplicate_of = excluded.duplicate_of,
+                    status = CASE WHEN jobs.status = 'analysed' THEN 'analysed' ELSE 'duplicate' END""",
+                (job['id'], description_hash(job), job.get('title'), job.get('company'), job.get('location'),
+                 time.time(), original_id))
+
+    def mark_seen(self, job_ids):
+        """Records that these (already known) jobs are still listed, for the trends."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE jobs SET last_seen = ? WHERE id = ?", [(now, job_id) for job_id in job_ids])
+
+    def update_extraction(self, record, field_versions, model_name=None):
+        """
+        Saves a partially re-extracted record with its new field versions. analysed_at is bumped, so
+        watermark-based readers see the row again. Without a model_name nothing was re-extracted,
+        and only the field versions are recorded.
+        """
+        versions = json.dumps(field_versions, sort_keys=True)
+        with self.conn:
+            if model_name is None:
+                self.conn.execute("UPDATE jobs SET field_versions = ? WHERE id = ?", (versions, record['id']))
+            else:
+                self.conn.execute(
+                    "UPDATE jobs SET record = ?, field_versions = ?, model_name = ?, analysed_at = ? WHERE id = ?",
+                    (json.dumps(record), versions, model_name, time.time(), record['id']))
+
+    def fill_descriptions(self, jobs) -> int:
+        """Stores descriptions (e.g. from the archived queues) for jobs that don't have one yet."""
+        with self.conn:
+            cursor = self.conn.executemany(
+                "UPDATE jobs SET description = ? WHERE id = ? AND description IS NULL",
+                [(compress_description(job.get('description')), job['id']) for job in jobs if job.get('description')])
+        return cursor.rowcount
+
+    def update_records(self, records):
+        """Rewrites stored records in place without touching their analysed_at timestamps."""
+        with self.conn:
+            self.conn.executemany("UPDATE jobs SET record = ? WHERE id = ?",
+                                  [(json.dumps(record), record['id']) for record in records])
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def reset_watermarks(self):
+        """
+        Makes the incrementally kept aggregates (tag cube, trends) rebuild from scratch next time,
+        for when stored rows changed under them. They keep their position in a *_watermark key.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM meta WHERE key LIKE ? ESCAPE '!'", ("%!_watermark",))
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # --- Migration ---
+
+    def migrate_from_files(self, queue_file: str = QUEUE_FILE, database_file: str = DATABASE_FILE,
+                           archive_dir: str = ARCHIVE_DIR):
+        """One-shot import of the existing database CSV, queue JSONL and archived queues."""
+        analysed = []
+        if os.path.exists(database_file):
+            with open(database_file, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    if not row.get('id'):
+                        continue
+                    analysed.append(_parse_csv_row(row))
+
+        # Archived queues still have the descriptions, so we can hash and keep them
+        desc_hashes, descriptions = {}, {}
+        for archive_file in sorted(glob.glob(os.path.join(archive_dir, "*.jsonl"))):
+            for job in _read_jsonl(archive_file):
+                desc_hashes[job['id']] = description_hash(job)
+                descriptions[job['id']] = job.get('description')
+        self.mark_analysed(analysed, desc_hashes, descriptions=descriptions)
+        if analysed:
+            # Jobs only in the CSV are at least as old as the CSV's last write; archived ones are dated below
+            csv_time = os.path.getmtime(database_file)
+            with self.conn:
+                self.conn.executemany("UPDATE jobs SET first_seen = MIN(first_seen, ?) WHERE id = ?",
+                                      [(csv_time, row['id']) for row in analysed])
+        self.backfill_seen_times(archive_dir)
+        # Already dated, so the one-off re-dating of older stores in __init__ has nothing to do
+        self.set_meta("seen_backfilled", time.time())
+
+        if os.path.exists(queue_file):
+            self.add_queued(_read_jsonl(queue_file))
+
+        self.set_meta("migrated", time.time())
+        print(f"--- Migrated {len(analysed)} analysed jobs into {self.path} ---")
+
+    def backfill_seen_times(self, archive_dir: str = ARCHIVE_DIR) -> int:
+        """
+        Dates jobs by the archived queues they're in. An archive is named for when it was processed,
+        soon after the scrape, so first_seen only ever moves earlier and last_seen later: jobs the
+        scraper stamped itself keep their own times. Returns how many stored jobs it re-dated.
+        """
+        # job id -> [earliest, latest] archive it's in
+        seen = {}
+        for path in sorted(glob.glob(os.path.join(archive_dir, "*.jsonl"))):
+            stamp = archive_time(path)
+            if stamp is None:
+                continue
+            for job in _read_jsonl(path):
+                span = seen.setdefault(job['id'], [stamp, stamp])
+                span[0], span[1] = min(span[0], stamp), max(span[1], stamp)
+        with self.conn:
+            cursor = self.conn.executemany(
+                "UPDATE jobs SET first_seen = MIN(COALESCE(first_seen, ?), ?), last_seen = MAX(COALESCE(last_seen, 0), ?) "
+                "WHERE id = ? AND (first_seen IS NULL OR first_seen > ? OR last_seen IS NULL OR last_seen < ?)",
+                [(first, first, last, job_id, first, last) for job_id, (first, last) in seen.items()])
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+def archive_time(path):
+    """When an archived queue was processed, from its name. None if the name has no date."""
+    match = ARCHIVE_TIME_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None
+    day, hour, minute = match.groups()
+    return datetime.strptime(f"{day} {hour or '00'}:{minute or '00'}", "%Y-%m-%d %H:%M").timestamp()
+
+
+def _parse_csv_row(row):
+    """A database CSV row back in the shape mark_analysed stores: lists, ints and the salary dict."""
+    for field in LIST_FIELDS:
+        if isinstance(row.get(field), str):
+            row[field] = [s.strip() for s in row[field].split(';') if s.strip()]
+    for field in INT_FIELDS:
+        if isinstance(row.get(field), str):
+            try:
+                row[field] = int(float(row[field]))
+            except (TypeError, ValueError):
+                row[field] = None
+    if isinstance(row.get('salary'), str):
+        # _save_to_csv writes the salary dict as its Python repr
+        try:
+            salary = ast.literal_eval(row['salary'])
+        except (ValueError, SyntaxError):
+            salary = None
+        row['salary'] = salary if isinstance(salary, dict) else None
+    return row
+
+
+def _read_jsonl(path):
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "id" in job:
+                jobs.append(job)
+    return jobs
+
+
+if __name__ == "__main__":
+    store = JobStore()
+    print(f"--- {store.path}: {store.counts()} ---")
+    jobs, before, after = store.token_savings()
+    if jobs:
+        print(f"--- Trimmed prompts for {jobs} jobs: {before} -> {after} est. tokens ---")
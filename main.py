@@ -1,19 +1,201 @@
+import argparse
+import os
 import sys
-import analyseDescriptions
-import model
-import visualiseData
+import time
+from collections import Counter
+from config import QUEUE_FILE, DATABASE_FILE
+
+# Each subcommand imports what it needs when it runs, so `status` and `report` don't pay for
+# instructor/google.genai, matplotlib or Playwright. `python benchmark.py` times them (`--startup-runs N`).
+COMMANDS = ("scrape", "analyse", "report", "status")
+DEFAULT_TEST_FILE = 'data/raw/testData.jsonl'
+# Same files as tagStats.CUBE_FILE and metrics.METRICS_FILE, without importing pandas to find them
+CUBE_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "tag_stats.parquet")
+METRICS_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "metrics.json")
+REPORT_FIELDS = ['languages', 'frameworks']
+
+
+def run_legacy(fileName=None):
+    """The original flow: analyse a file to testOutput.csv, then draw the charts."""
+    import analyseDescriptions
+    import visualiseData
 
-if __name__ == "__main__":
     analyzer = analyseDescriptions.JobDescriptionAnalyzer()
-    if len(sys.argv) > 1:
-        fileName = sys.argv[1]
+    if fileName:
         print(f"--- Using custom file: {fileName} ---")
     else:
-        fileName = 'data/raw/testData.jsonl'
+        fileName = DEFAULT_TEST_FILE
         print(f"--- No file provided. Using default: {fileName} ---")
-    
+
     outputFile = 'data/processed/testOutput.csv'
     analyzer.run_analysis_from_file(fileName, outputFile)
     print(f"Analysis complete. Data saved to {outputFile}.")
     visualiseData.generate_polished_reports(outputFile)
 
+
+def scrape(args):
+    if args.queries:
+        from parallelScraper import ParallelIndeedScraper, build_search_urls
+        urls = build_search_urls(args.queries, args.locations)
+        ParallelIndeedScraper(urls, page_limit=args.pages, contexts=args.contexts, headless=True).run()
+    else:
+        from scraper import IndeedScraper
+        IndeedScraper(url=args.url, page_limit=args.pages, headless=args.headless).run()
+
+
+def analyse(args):
+    from analyseDescriptions import JobDescriptionAnalyzer
+
+    pool = None
+    if args.pool:
+        from providerPool import ProviderPool
+        pool = ProviderPool.from_config()
+    analyzer = JobDescriptionAnalyzer(limit=args.limit, use_cache=not args.no_cache, pre_extract=args.pre_extract,
+                                      verbose=not args.quiet, output_format=args.format, provider_pool=pool)
+    if args.reextract:
+        analyzer.run_reextraction(max_cost=args.max_cost)
+    elif args.mode == "scheduled":
+        analyzer.run_analysis_scheduled(args.output, max_seconds=args.max_seconds, max_cost=args.max_cost,
+                                        concurrency=args.concurrency, requests_per_minute=args.rpm,
+                                        tokens_per_minute=args.tpm)
+    elif args.mode == "async":
+        analyzer.run_analysis_async(args.input, args.output, concurrency=args.concurrency,
+                                    requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                                    follow=args.follow, idle_timeout=args.idle_timeout)
+    elif args.mode == "batched":
+        analyzer.run_analysis_batched(args.input, args.output, batch_size=args.batch_size,
+                                      follow=args.follow, idle_timeout=args.idle_timeout)
+    else:
+        analyzer.run_analysis_from_file(args.input, args.output, follow=args.follow, idle_timeout=args.idle_timeout)
+
+
+def _top_tags(field, n):
+    """Top tags for a field straight off the cached cube, read with pyarrow alone."""
+    import pyarrow.parquet as pq
+
+    # Arrow's filter/group_by import pandas (~0.3s), and the cube is small enough to sum in Python
+    columns = pq.ParquetFile(CUBE_FILE).read(columns=['field', 'tag', 'count']).to_pydict()
+    totals = Counter()
+    for row_field, tag, count in zip(columns['field'], columns['tag'], columns['count']):
+        if row_field == field:
+            totals[tag] += count
+    return totals.most_common(n)
+
+
+def report(args):
+    if args.refresh or not os.path.exists(CUBE_FILE):
+        # Folding in new jobs needs pandas; the cached cube alone doesn't
+        from jobStore import JobStore
+        from trends import update_aggregates
+        store = JobStore()
+        update_aggregates(store)
+        store.close()
+
+    for field in args.fields:
+        print(f"\n{field.capitalize()} (top {args.top}):")
+        for tag, count in _top_tags(field, args.top):
+            print(f"  {tag: <30}{count: >8}")
+
+    if args.charts or args.trends:
+        import visualiseData
+        from jobStore import STORE_FILE
+        if args.charts:
+            visualiseData.generate_polished_reports(STORE_FILE)
+        if args.trends:
+            visualiseData.generate_trend_reports(STORE_FILE)
+
+
+def status(args):
+    from jobStore import JobStore, STORE_FILE
+    from scheduler import JobScheduler
+
+    if not os.path.exists(STORE_FILE):
+        print(f"--- No job store at {STORE_FILE} yet ---")
+    else:
+        # No migration here: status should only ever read
+        store = JobStore(STORE_FILE, migrate=False)
+        counts = store.counts()
+        print(f"Job store: {STORE_FILE}")
+        for job_status in ('queued', 'analysed', 'duplicate'):
+            print(f"  {job_status: <12}{counts.get(job_status, 0): >8}")
+        print(f"  {'scheduled': <12}{JobScheduler(store).pending(): >8}  (queued with a stored description)")
+        jobs, before, after = store.token_savings()
+        if jobs:
+            print(f"  Trimming saved {before - after} tokens over {jobs} jobs ({1 - after / before:.0%})")
+        store.close()
+
+    if os.path.exists(QUEUE_FILE):
+        with open(QUEUE_FILE, "rb") as f:
+            lines = sum(1 for _ in f)
+        print(f"Queue: {QUEUE_FILE}, {lines} jobs, {os.path.getsize(QUEUE_FILE) / 1024:.0f}KB")
+    else:
+        print(f"Queue: {QUEUE_FILE} is empty")
+
+    if os.path.exists(CUBE_FILE):
+        age = (time.time() - os.path.getmtime(CUBE_FILE)) / 3600
+        print(f"Tag cube: {CUBE_FILE}, updated {age:.1f}h ago")
+
+    if os.path.exists(METRICS_FILE):
+        import json
+        with open(METRICS_FILE, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(summary["started"]))
+        print(f"Last run ({started}, {summary['uptime_seconds']:.0f}s):")
+        for name, value in summary["counters"].items():
+            print(f"  {name: <50}{value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape, analyse and report on job postings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("scrape", help="Scrape Indeed into the queue")
+    p.add_argument("--url", help="Search URL for a single scrape (default: web developer in Ireland)")
+    p.add_argument("--pages", type=int, default=5)
+    p.add_argument("--queries", nargs="+", help="Scrape every query x location in parallel instead")
+    p.add_argument("--locations", nargs="+", default=["Ireland"])
+    p.add_argument("--contexts", type=int, default=4, help="Browser contexts for a parallel scrape")
+    p.add_argument("--headless", action="store_true")
+    p.set_defaults(handler=scrape)
+
+    p = commands.add_parser("analyse", help="Extract structured data from queued postings")
+    p.add_argument("input", nargs="?", default=QUEUE_FILE, help="Queue file to analyse")
+    p.add_argument("--output", default=DATABASE_FILE, help="CSV to append results to")
+    p.add_argument("--mode", choices=("sync", "async", "batched", "scheduled"), default="sync")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--batch-size", type=int, default=10)
+    p.add_argument("--rpm", type=int, help="Requests per minute quota")
+    p.add_argument("--tpm", type=int, help="Tokens per minute quota")
+    p.add_argument("--max-seconds", type=float, help="Time budget for a scheduled run")
+    p.add_argument("--max-cost", type=float, help="Estimated USD budget for a scheduled run or re-extraction")
+    p.add_argument("--follow", action="store_true", help="Keep tailing the queue while the scraper writes to it")
+    p.add_argument("--idle-timeout", type=float)
+    p.add_argument("--format", choices=("csv", "parquet", "both"), default="csv")
+    p.add_argument("--pool", action="store_true", help="Route calls across the providers in providerPool.py")
+    p.add_argument("--pre-extract", action="store_true")
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--quiet", action="store_true", help="No per-job output")
+    p.add_argument("--reextract", action="store_true", help="Re-extract out-of-date fields of stored jobs")
+    p.set_defaults(handler=analyse)
+
+    p = commands.add_parser("report", help="Top tags from the cached tag cube, optionally with charts")
+    p.add_argument("--fields", nargs="+", default=REPORT_FIELDS)
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--refresh", action="store_true", help="Fold newly analysed jobs into the cube first")
+    p.add_argument("--charts", action="store_true", help="Draw the tag charts to assets/")
+    p.add_argument("--trends", action="store_true", help="Draw the weekly trend charts to assets/")
+    p.set_defaults(handler=report)
+
+    p = commands.add_parser("status", help="Store, queue and last-run summary")
+    p.set_defaults(handler=status)
+    return parser
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or (sys.argv[1] not in COMMANDS and not sys.argv[1].startswith("-")):
+        # `python main.py [file]` still does what it always did
+        run_legacy(sys.argv[1] if len(sys.argv) > 1 else None)
+    else:
+        args = build_parser().parse_args()
+        args.handler(args)
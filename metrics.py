@@ -0,0 +1,179 @@
+import json
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from config import DATABASE_FILE
+
+METRICS_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "metrics.json")
+PROMETHEUS_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "metrics.prom")
+# Samples kept per histogram for percentiles; counts and sums stay exact past this
+MAX_SAMPLES = 10_000
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "jobboard_"
+
+
+class Histogram:
+    """Latency/size distribution. Keeps a uniform reservoir sample so memory stays flat on long runs."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.max_samples:
+                self.samples[slot] = value
+
+    def quantile(self, q: float) -> float:
+        return _pick(sorted(self.samples), q)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            **{f"p{int(q * 100)}": round(_pick(ordered, q), 6) for q in QUANTILES},
+        }
+
+
+def _pick(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """
+    Counters and histograms for one process, shared by the scraper and the analyzer.
+    Labels are passed as keyword arguments, e.g. metrics.observe("card_seconds", 0.4, method="network").
+    """
+
+    def __init__(self, json_path: str = METRICS_FILE, prometheus_path: str = None):
+        # Where export() writes; the Prometheus file is only written if a path is given
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes how long the block took, in seconds, whether or not it raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get(_key(name, labels), 0)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self.histograms.get(_key(name, labels)) or Histogram()
+
+    def summary(self) -> dict:
+        return {
+            "started": self.started,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": {name + _label_text(labels): value for (name, labels), value in sorted(self.counters.items())},
+            "histograms": {name + _label_text(labels): hist.summary()
+                           for (name, labels), hist in sorted(self.histograms.items())},
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format; histograms are written as summaries with quantiles."""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = PREFIX + _metric_name(name) + "_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_label_text(labels)} {value}")
+        for (name, labels), hist in sorted(self.histograms.items()):
+            metric = PREFIX + _metric_name(name)
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} summary")
+                typed.add(metric)
+            for q in QUANTILES:
+                lines.append(f"{metric}{_label_text(labels + (('quantile', q),))} {hist.quantile(q)}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {hist.total}")
+            lines.append(f"{metric}_count{_label_text(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Writes the JSON summary (and the Prometheus text file if set), atomically."""
+        _write_atomic(self.json_path, json.dumps(self.summary(), indent=2))
+        if self.prometheus_path:
+            _write_atomic(self.prometheus_path, self.prometheus_text())
+        print(f"--- Metrics written to {self.json_path} ---")
+
+    def report(self, prefix: str = ""):
+        """One console line per histogram whose name starts with `prefix`."""
+        for (name, labels), hist in sorted(self.histograms.items()):
+            if name.startswith(prefix) and hist.count:
+                s = hist.summary()
+                print(f"--- {name}{_label_text(labels)}: {s['count']} samples, p50 {s['p50'] * 1000:.0f}ms, "
+                      f"p95 {s['p95'] * 1000:.0f}ms, p99 {s['p99'] * 1000:.0f}ms ---")
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Process-wide registry; components use this unless they're handed their own
+METRICS = Metrics()
+
+
+if __name__ == "__main__":
+    # Pretty-prints the last exported summary
+    if not os.path.exists(METRICS_FILE):
+        print(f"--- No metrics at {METRICS_FILE} yet ---")
+    else:
+        with open(METRICS_FILE, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        for name, value in summary["counters"].items():
+            print(f"{name: <50} {value}")
+        for name, stats in summary["histograms"].items():
+            print(f"{name: <50} n={stats['count']} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s")
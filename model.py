@@ -1,6 +1,15 @@
-from pydantic import BaseModel, Field, field_validator, model_validator
+from functools import lru_cache
+from pydantic import BaseModel, Field, create_model, field_validator, model_validator
 from typing import List, Literal, Optional
-from instructor import Maybe
+from techTerms import canonicalize_tags
+
+# Bump whenever the analysis models change shape, so cached/stored extractions are redone
+SCHEMA_VERSION = 1
+# Per-field versions on top of that. A field not listed is at version 1. Bump one when its type
+# or description changes (e.g. {"salary": 2}) and run_reextraction redoes only that field for
+# the stored jobs, instead of the whole analysis. New fields need no entry; jobs without them
+# are picked up anyway.
+FIELD_VERSIONS = {}
 
 class JobAnalysisSimple(BaseModel):
     extracted_title: str
@@ -16,12 +25,12 @@ class JobAnalysisSimple(BaseModel):
     # Market Intelligence
     salary_range: Optional[str] = Field(description="Extract if mentioned, else None")
     
-    @field_validator('languages', 'frameworks', 'tools', mode='before')
+    @field_validator('languages', 'frameworks', 'tools', 'cloud_platforms', mode='before')
     @classmethod
     def ensure_lowercase(cls, v):
-        """Ensures tags are consistent for easier filtering."""
+        """Ensures tags are consistent for easier filtering: lowercase, and aliases mapped to one canonical id."""
         if isinstance(v, list):
-            return [item.lower().strip() for item in v]
+            return canonicalize_tags(v)
         return v
 
 class Salary(BaseModel):
@@ -46,10 +55,50 @@ class JobAnalysisComplex(JobAnalysisSimple):
         default=None, 
         description="Extract structured salary data if compensation is mentioned (e.g. '35k', '40k-50k'). If no salary is mentioned at all, return None."
     )
-    
-    
-    
-    
-    
 
-    
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def field_versions(analysis_model) -> dict:
+    """Current version of every field in the analysis model."""
+    return {name: FIELD_VERSIONS.get(name, 1) for name in analysis_model.model_fields}
+
+
+def schema_tag(analysis_model) -> str:
+    """Short version string for cache keys: the schema version, plus any fields past version 1."""
+    bumped = [f"{name}{version}" for name, version in sorted(field_versions(analysis_model).items()) if version != 1]
+    return "-".join([f"v{SCHEMA_VERSION}"] + bumped)
+
+
+def stale_fields(record: dict, stored_versions, analysis_model) -> tuple:
+    """
+    Fields of a stored record that are older than the current schema: extracted at a lower
+    version, or missing from it altogether. Records saved before versions were kept count as version 1.
+    """
+    stored_versions = stored_versions or {}
+    return tuple(name for name, version in field_versions(analysis_model).items()
+                 if name not in record or stored_versions.get(name, 1) < version)
+
+
+@lru_cache(maxsize=None)
+def batch_model_for(analysis_model):
+    """Wraps an analysis model so one request can return results for several postings."""
+    item_model = create_model(
+        f"{analysis_model.__name__}BatchItem",
+        __base__=analysis_model,
+        job_id=(str, Field(description="The JOB ID shown above the posting this result belongs to")),
+    )
+    return create_model(
+        f"{analysis_model.__name__}Batch",
+        results=(List[item_model], Field(description="One result per job posting, in any order")),
+    )
+
+
+@lru_cache(maxsize=None)
+def sub_schema(analysis_model, fields: tuple):
+    """A narrowed copy of the analysis model with only `fields`, for asking the LLM about just those."""
+    name = f"{analysis_model.__name__}Only_" + "_".join(fields)
+    return create_model(
+        name,
+        **{field: (analysis_model.model_fields[field].annotation, analysis_model.model_fields[field])
+           for field in fields},
+    )
@@ -0,0 +1,159 @@
+import hashlib
+import re
+import numpy as np
+from extractionCache import normalise_text
+
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket, pairs below ~0.4 rarely do
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+# Estimated Jaccard similarity above which a candidate counts as the same posting
+SIMILARITY_THRESHOLD = 0.8
+_rng = np.random.RandomState(20240131)
+# Multiply-shift hash family: (a * x + b) wrapping at 2^64, top 32 bits kept. a must be odd.
+# Fixed seed: signatures are stored, so the permutations must be the same on every run
+PERM_A = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+PERM_B = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str):
+    """Overlapping word n-grams of the normalised text, so small edits only touch a few shingles."""
+    words = re.findall(r"\w+", normalise_text(text))
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text: str):
+    """MinHash signature (NUM_PERM uint32 values) of the text's shingles, or None if it has none."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+                          for g in grams), dtype=np.uint64, count=len(grams))
+    with np.errstate(over="ignore"):
+        permuted = (PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    """One bucket key per band. The band number is mixed in so bands never collide with each other."""
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        # SQLite integers are signed 64-bit
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity: the fraction of permutations where the minimums agree."""
+    return float(np.mean(a == b))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index over job descriptions, kept in the job store's database.
+    A lookup only reads the rows sharing one of its BANDS bucket keys (an indexed IN query),
+    so it stays cheap however many postings are indexed.
+    """
+
+    def __init__(self, store, threshold: float = SIMILARITY_THRESHOLD):
+        self.store = store
+        self.conn = store.conn
+        self.threshold = threshold
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS minhash (id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS lsh_buckets (key INTEGER NOT NULL, id TEXT NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_key ON lsh_buckets (key)")
+
+    def find(self, job_json, signature=None):
+        """Returns (id of the closest indexed posting, similarity) if one is above the threshold, else None."""
+        signature = minhash(job_json.get('description')) if signature is None else signature
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        rows = self.conn.execute(
+            f"SELECT DISTINCT m.id, m.signature FROM lsh_buckets b JOIN minhash m ON m.id = b.id "
+            f"WHERE b.key IN ({','.join('?' * len(keys))}) AND b.id != ?",
+            (*keys, job_json.get('id'))).fetchall()
+        best = None
+        for candidate_id, blob in rows:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate_id, score)
+        return best
+
+    def add(self, job_id, signature):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO minhash (id, signature) VALUES (?, ?)",
+                              (job_id, signature.tobytes()))
+            self.conn.execute("DELETE FROM lsh_buckets WHERE id = ?", (job_id,))
+            self.conn.executemany("INSERT INTO lsh_buckets (key, id) VALUES (?, ?)",
+                                  [(key, job_id) for key in band_keys(signature)])
+
+    def check(self, job_json):
+        """
+        Ingest-time check. Returns the id of the posting this one duplicates, or None, in which case
+        it's indexed as a new original. Duplicates aren't indexed, so groups don't chain.
+        """
+        signature = minhash(job_json.get('description'))
+        if signature is None:
+            return None
+        match = self.find(job_json, signature)
+        if match is not None:
+            return match[0]
+        self.add(job_json['id'], signature)
+        return None
+
+    def check_and_flag(self, job_json):
+        """check(), and if it's a duplicate, record it in the job store as one. Returns the original's id or None."""
+        original = self.check(job_json)
+        if original is not None:
+            self.store.mark_duplicate(job_json, original)
+        return original
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM minhash").fetchone()[0]
+
+
+def duplicate_groups(store):
+    """
+    One row per original with reposts: (original id, title, company, reposts, companies reposting it),
+    most reposted first. Originals that were never queued take their title from the reposts.
+    """
+    rows = store.conn.execute("""
+        SELECT d.duplicate_of, COALESCE(o.title, MIN(d.title)), COALESCE(o.company, MIN(d.company)),
+               COUNT(*), GROUP_CONCAT(DISTINCT d.company)
+        FROM jobs d LEFT JOIN jobs o ON o.id = d.duplicate_of
+        WHERE d.duplicate_of IS NOT NULL
+        GROUP BY d.duplicate_of ORDER BY COUNT(*) DESC""").fetchall()
+    return rows
+
+
+if __name__ == "__main__":
+    # Indexes the archived and queued postings, flags the duplicates among them and prints the groups
+    import glob
+    import os
+    from config import QUEUE_FILE
+    from jobStore import JobStore, ARCHIVE_DIR, _read_jsonl
+
+    store = JobStore()
+    index = NearDuplicateIndex(store)
+    files = sorted(glob.glob(os.path.join(ARCHIVE_DIR, "*.jsonl"))) + ([QUEUE_FILE] if os.path.exists(QUEUE_FILE) else [])
+    flagged = 0
+    for path in files:
+        for job in _read_jsonl(path):
+            if store.duplicate_of(job['id']) is not None:
+                continue
+            if index.check_and_flag(job) is not None:
+                flagged += 1
+    print(f"--- {index.count()} postings indexed, {flagged} near-duplicates flagged ---")
+    if flagged:
+        # Some of these may already be counted in the tag cube and trends
+        from trends import update_aggregates
+        update_aggregates(store, rebuild=True)
+    for original_id, title, company, reposts, companies in duplicate_groups(store)[:20]:
+        print(f"{reposts: >4} x {title} ({company}) [{original_id}] reposted by: {companies}")
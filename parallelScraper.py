@@ -0,0 +1,272 @@
+import asyncio
+import os
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs, quote_plus, urlencode, urlparse, urlunparse
+from playwright.async_api import async_playwright
+from config import QUEUE_FILE
+from jobStore import JobStore
+from detailParser import is_detail_response, parse_job_detail
+from jobQueue import append_record, repair_queue
+from scrapeCheckpoint import ScrapeCheckpoint
+from metrics import METRICS
+from nearDuplicates import NearDuplicateIndex
+from scraper import (USER_AGENT, STEALTH_SCRIPT, CARD_SELECTOR, NO_RESULTS_SELECTOR, TITLE_SELECTOR,
+                     DESCRIPTION_SELECTOR, DETAIL_TIMEOUT, READ_DETAILS_SCRIPT, DETAILS_SELECTORS, job_from_details, report_scrape_metrics, search_query)
+
+RESULTS_PER_PAGE = 10
+
+
+def build_search_urls(queries, locations, domain="ie.indeed.com"):
+    """Every query x location combination as a date-sorted Indeed search URL."""
+    return [f"https://{domain}/jobs?q={quote_plus(q)}&l={quote_plus(l)}&sort=date"
+            for q in queries for l in locations]
+
+
+def page_url(url, page_num):
+    """Jumps straight to a results page via Indeed's `start` offset instead of clicking 'Next'."""
+    parts = urlparse(url)
+    params = parse_qs(parts.query)
+    params.setdefault("sort", ["date"])
+    params["start"] = [str((page_num - 1) * RESULTS_PER_PAGE)]
+    return urlunparse(parts._replace(query=urlencode(params, doseq=True)))
+
+
+class DomainLimiter:
+    """Caps concurrent page loads and detail fetches per domain, spaced at least `min_interval` seconds apart."""
+
+    def __init__(self, per_domain=2, min_interval=2.0):
+        self.per_domain = per_domain
+        self.min_interval = min_interval
+        self.semaphores = {}
+        self.locks = {}
+        self.last_request = {}
+
+    def _domain_state(self, domain):
+        if domain not in self.semaphores:
+            self.semaphores[domain] = asyncio.Semaphore(self.per_domain)
+            self.locks[domain] = asyncio.Lock()
+            self.last_request[domain] = 0.0
+        return self.semaphores[domain], self.locks[domain]
+
+    async def acquire(self, url):
+        domain = urlparse(url).netloc
+        semaphore, lock = self._domain_state(domain)
+        await semaphore.acquire()
+        async with lock:
+            wait = self.last_request[domain] + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last_request[domain] = time.monotonic()
+        return domain
+
+    def release(self, domain):
+        self.semaphores[domain].release()
+
+    @asynccontextmanager
+    async def hold(self, url):
+        domain = await self.acquire(url)
+        try:
+            yield
+        finally:
+            self.release(domain)
+
+
+class ParallelIndeedScraper:
+    """
+    Scrapes several search URLs at once across a pool of browser contexts.
+    Every (url, page) pair is its own task, so one slow search doesn't hold up the rest.
+    """
+
+    def __init__(self, urls, page_limit=1, contexts=4, headless=True, per_domain=2, min_interval=2.0,
+                 use_network=True, card_delay=None, har_path=None, checkpoint=None,
+                 verbose=True, metrics=None, skip_near_duplicates=True):
+        self.urls = list(urls)
+        self.use_network = use_network
+        self.card_delay = card_delay
+        self.har_path = har_path
+        self.verbose = verbose
+        self.metrics = metrics or METRICS
+        self.skip_near_duplicates = skip_near_duplicates
+        self.duplicates = None
+        self.checkpoint = checkpoint or ScrapeCheckpoint()
+        self.page_limit = page_limit
+        self.contexts = contexts
+        self.headless = headless
+        self.limiter = DomainLimiter(per_domain, min_interval)
+        self.output_file = QUEUE_FILE
+        # Shared across every context so two searches never scrape the same job
+        self.processed_ids = set()
+        self.exhausted_urls = set()
+        self.failed_urls = set()
+        self.store = None
+        self.pages_scraped = 0
+        self.jobs_saved = 0
+        queue_dir = os.path.dirname(self.output_file)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+
+    def run(self, resume=True):
+        asyncio.run(self._run(resume))
+
+    async def _run(self, resume):
+        self.store = JobStore()
+        if self.skip_near_duplicates:
+            self.duplicates = NearDuplicateIndex(self.store)
+        repair_queue(self.output_file)
+        tasks = asyncio.Queue()
+        for page_num in range(1, self.page_limit + 1):
+            for url in self.urls:
+                if resume and page_num in self.checkpoint.completed_pages(url):
+                    continue
+                tasks.put_nowait((url, page_num))
+
+        started = time.perf_counter()
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(
+                headless=self.headless,
+                args=["--disable-blink-features=AutomationControlled"]
+            )
+            with open(self.output_file, "a", encoding="utf-8") as f:
+                await asyncio.gather(*(self._worker(browser, tasks, f) for _ in range(self.contexts)))
+            await browser.close()
+
+        # Searches that finished (or ran out of results) start fresh next run, the rest resume
+        all_pages = set(range(1, self.page_limit + 1))
+        for url in self.urls:
+            if url in self.failed_urls:
+                continue
+            if url in self.exhausted_urls or self.checkpoint.completed_pages(url) >= all_pages:
+                self.checkpoint.clear(url)
+
+        minutes = (time.perf_counter() - started) / 60
+        print(f"\n--- Scraping Complete. Data saved to {self.output_file} ---")
+        print(f"--- {self.pages_scraped} pages, {self.jobs_saved} jobs in {minutes * 60:.0f}s: "
+              f"{self.pages_scraped / minutes:.1f} pages/min, {self.jobs_saved / minutes:.1f} jobs/min ---")
+        report_scrape_metrics(self.metrics)
+
+    async def _worker(self, browser, tasks, file_handle):
+        context = await browser.new_context(user_agent=USER_AGENT, viewport={"width": 1920, "height": 1080})
+        await context.add_init_script(STEALTH_SCRIPT)
+        if self.har_path:
+            await context.route_from_har(self.har_path, not_found="fallback")
+        page = await context.new_page()
+        try:
+            while True:
+                try:
+                    url, page_num = tasks.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if url in self.exhausted_urls:
+                    continue
+                try:
+                    await self._scrape_page(page, url, page_num, file_handle)
+                except Exception as e:
+                    self.failed_urls.add(url)
+                    self.metrics.incr("scrape_page_errors", error=type(e).__name__)
+                    print(f"Failed page {page_num} of {url}: {e}")
+        finally:
+            await context.close()
+
+    async def _scrape_page(self, page, url, page_num, file_handle):
+        target = page_url(url, page_num)
+        async with self.limiter.hold(target):
+            await page.goto(target)
+            # A timeout here raises, so the page counts as failed and its search resumes from it next run
+            await page.wait_for_selector(f"{CARD_SELECTOR}, {NO_RESULTS_SELECTOR}", timeout=10000)
+        if await page.locator(CARD_SELECTOR).count() == 0:
+            # Indeed says there's nothing more, so this search has run off its last page
+            self.exhausted_urls.add(url)
+            return
+
+        self.pages_scraped += 1
+        self.metrics.incr("scrape_pages")
+        page_started = time.perf_counter()
+        job_cards = await page.locator(CARD_SELECTOR).all()
+        print(f"Found {len(job_cards)} jobs on page {page_num} of {url}")
+        for card in job_cards:
+            try:
+                await self._scrape_card(page, card, file_handle, search_query(url))
+            except Exception as e:
+                # Skip failed cards to keep the scraper moving, but count them
+                self.metrics.incr("scrape_card_errors", error=type(e).__name__)
+        self.metrics.observe("scrape_page_seconds", time.perf_counter() - page_started)
+        self.checkpoint.mark_page_done(url, page_num, cursor=page_url(url, page_num + 1))
+
+    async def _scrape_card(self, page, card, file_handle, query=None):
+        if self.card_delay:
+            await asyncio.sleep(random.uniform(*self.card_delay))
+        started = time.perf_counter()
+        await card.scroll_into_view_if_needed()
+        job_id = await card.get_attribute("data-jk")
+        if not job_id:
+            job_id = await card.locator("a").first.get_attribute("data-jk")
+
+        self.metrics.incr("scrape_cards_seen")
+        if job_id in self.processed_ids or self.store.has_job(job_id):
+            self.metrics.incr("scrape_jobs_skipped")
+            # Still listed, which is what the trends' open postings count goes on
+            self.store.mark_seen([job_id])
+            return
+        # Claim the id before awaiting anything else, so no other context picks it up
+        self.processed_ids.add(job_id)
+        try:
+            # The click fetches the viewjob details from the same domain, so it's rate limited like a page load
+            async with self.limiter.hold(page.url):
+                job_data, method = await self._extract_details(page, card, job_id)
+        except Exception:
+            self.processed_ids.discard(job_id)
+            raise
+        self.metrics.observe("scrape_card_seconds", time.perf_counter() - started, method=method)
+        job_data['query'] = query
+
+        if self.duplicates is not None:
+            original = self.duplicates.check_and_flag(job_data)
+            if original is not None:
+                self.metrics.incr("scrape_near_duplicates")
+                if self.verbose:
+                    print(f"Skipping {job_id} (Near-duplicate of {original})")
+                return
+
+        with self.metrics.timer("scrape_write_seconds"):
+            append_record(file_handle, job_data)
+            self.store.add_queued([job_data])
+        self.jobs_saved += 1
+        self.metrics.incr("scrape_jobs_saved", method=method)
+        if self.verbose:
+            print(f"Saved: {job_data['title'][:30]}...")
+
+    async def _extract_details(self, page, card, job_id):
+        """Network response first, rendered details pane as the fallback. Returns (job_data, method)."""
+        if self.use_network:
+            try:
+                async with page.expect_response(lambda r: is_detail_response(r.url, job_id),
+                                                timeout=DETAIL_TIMEOUT) as response_info:
+                    await card.click()
+                response = await response_info.value
+                job_data = parse_job_detail(await response.text(), job_id)
+                if job_data:
+                    return job_data, "network"
+            except Exception:
+                pass
+        else:
+            await card.click()
+        return await self._extract_from_dom(page, job_id), "dom"
+
+    async def _extract_from_dom(self, page, job_id):
+        try:
+            await page.wait_for_url(re.compile(f"vjk={re.escape(job_id)}"), timeout=DETAIL_TIMEOUT)
+        except Exception:
+            pass
+        await page.locator(TITLE_SELECTOR).wait_for(state="visible", timeout=DETAIL_TIMEOUT)
+        await page.locator(DESCRIPTION_SELECTOR).wait_for(state="visible", timeout=DETAIL_TIMEOUT)
+        # Same read as IndeedScraper.extract_job_from_dom, only awaited
+        return job_from_details(job_id, await page.evaluate(READ_DETAILS_SCRIPT, DETAILS_SELECTORS))
+
+
+if __name__ == "__main__":
+    urls = build_search_urls(["web developer", "frontend developer", "full stack developer"], ["Ireland"])
+    scraper = ParallelIndeedScraper(urls, page_limit=5, contexts=4, headless=True)
+    scraper.run()
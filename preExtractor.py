@@ -0,0 +1,251 @@
+import json
+import re
+from collections import deque
+from functools import lru_cache
+from techTerms import ALIASES, TERM_FIELDS
+
+TECH_FIELDS = ['languages', 'frameworks', 'tools', 'cloud_platforms']
+# Spellings that are ordinary English words in running text ("go live", "REST of the team")
+AMBIGUOUS_IN_TEXT = {"go", "rest", "spring", "nest", "py", "ts", "wp", "ror", "express", "rails", "swift", "node"}
+
+SALARY_PATTERN = re.compile(
+    r"(?P<currency>[€£$])\s?(?P<min>\d[\d,.]*)\s?(?P<min_k>k)?"
+    r"(?:\s?(?:-|–|to)\s?[€£$]?\s?(?P<max>\d[\d,.]*)\s?(?P<max_k>k)?)?"
+    r"(?P<tail>[^.\n]{0,30})",
+    re.IGNORECASE)
+YEARS_PATTERN = re.compile(
+    r"(\d{1,2})\s*(?:\+|plus)?\s*(?:(?:-|–|to)\s*\d{1,2}\s*\+?\s*)?(?:years?|yrs?)(?:'|’)?\b(?=[^.\n]{0,60}\bexperience)",
+    re.IGNORECASE)
+HYBRID_PATTERN = re.compile(r"\bhybrid\b|\bdays? (?:a|per) week in (?:the )?office\b", re.IGNORECASE)
+REMOTE_PATTERN = re.compile(r"\b(?:fully |100% )?remote\b|\bwork from home\b|\bwfh\b", re.IGNORECASE)
+ONSITE_PATTERN = re.compile(r"\bon-?site\b|\bin-office\b|\boffice-based\b|\bin the office\b", re.IGNORECASE)
+SENIORITY_TITLE_PATTERNS = [
+    ("Lead", re.compile(r"\b(?:lead|principal|staff|head of|architect)\b", re.IGNORECASE)),
+    ("Senior", re.compile(r"\b(?:senior|sr\.?)\b", re.IGNORECASE)),
+    ("Junior", re.compile(r"\b(?:junior|jr\.?|graduate|entry[- ]level|intern|trainee)\b", re.IGNORECASE)),
+    ("Mid", re.compile(r"\b(?:mid|intermediate)\b", re.IGNORECASE)),
+]
+CURRENCIES = {"€": "EUR", "£": "GBP", "$": "USD"}
+# Part of the extraction cache key; bump when the rules change so cached answers are redone
+RULES_VERSION = 2
+
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick automaton: finds every vocabulary term in one pass over the text,
+    however large the vocabulary gets.
+    """
+
+    def __init__(self, patterns: dict):
+        # patterns: lowercase keyword -> value reported on a match
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword, value in patterns.items():
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(keyword), value))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text: str):
+        """Yields (start, end, value) for each whole-word match in `text`."""
+        text = text.lower()
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                start = end - length
+                before = text[start - 1] if start > 0 else " "
+                after = text[end] if end < len(text) else " "
+                if not before.isalnum() and not (after.isalnum() or after in "#+"):
+                    yield start, end, value
+
+
+@lru_cache(maxsize=None)
+def build_tech_automaton():
+    """Automaton over every spelling of the known tech terms, reporting the canonical id."""
+    patterns = {}
+    for canonical, spellings in ALIASES.items():
+        if canonical not in TERM_FIELDS:
+            continue
+        for spelling in [canonical] + spellings:
+            spelling = spelling.lower()
+            if spelling not in AMBIGUOUS_IN_TEXT:
+                patterns[spelling] = canonical
+    return KeywordAutomaton(patterns)
+
+
+def _to_number(digits: str, thousands: bool):
+    value = float(digits.replace(",", "").rstrip("."))
+    return value * 1000 if thousands else value
+
+
+class PreExtractor:
+    """
+    Fills the analysis fields that rules can answer reliably, and reports which fields
+    still need the LLM. With `trust_local_tech`, the vocabulary match is taken as the
+    final word on the tech lists (and domain knowledge is left empty), so many jobs need no call at all.
+    """
+
+    def __init__(self, trust_local_tech: bool = False):
+        self.trust_local_tech = trust_local_tech
+        self.automaton = build_tech_automaton()
+
+    def extract(self, job_json, analysis_model):
+        """
+        Returns (resolved_fields_dict, unresolved_field_names) for this job. Unresolved names are in
+        model field order, so they make a stable key for sub_schema.
+        """
+        title = job_json.get('title') or ""
+        text = f"{title}\n{job_json.get('location') or ''}\n{job_json.get('description') or ''}"
+        fields = analysis_model.model_fields
+        resolved = {}
+
+        if title and 'extracted_title' in fields:
+            resolved['extracted_title'] = title
+        company = job_json.get('company')
+        if company and company not in ("Unknown", "Unknown Company") and 'extracted_company' in fields:
+            resolved['extracted_company'] = company
+
+        # Tech hits are always returned; unless trusted they're only merged into the LLM's lists
+        tech = self.find_tech(text)
+        resolved.update(tech)
+        if self.trust_local_tech and 'domain_knowledge' in fields:
+            resolved['domain_knowledge'] = []
+
+        # Only fields a rule actually matched count as answered; the rest go to the LLM
+        work_setting = self.find_work_setting(text)
+        if work_setting is not None:
+            resolved['work_setting'] = work_setting
+        years = self.find_min_years(text)
+        if years is not None:
+            resolved['min_years_experience'] = years
+
+        salary, salary_text = self.find_salary(text)
+        if salary is not None:
+            resolved['salary_range'] = salary_text
+            resolved['salary'] = salary
+
+        seniority = self.find_seniority(title, years)
+        if seniority is not None:
+            resolved['seniority_level'] = seniority
+
+        resolved = {field: value for field, value in resolved.items() if field in fields}
+        needs_llm = set() if self.trust_local_tech else set(TECH_FIELDS)
+        unresolved = tuple(field for field in fields if field not in resolved or field in needs_llm)
+        return resolved, unresolved
+
+    def find_tech(self, text):
+        found = {field: [] for field in TECH_FIELDS}
+        for _, _, canonical in self.automaton.find(text):
+            field = TERM_FIELDS[canonical]
+            if canonical not in found[field]:
+                found[field].append(canonical)
+        return found
+
+    def find_work_setting(self, text):
+        if HYBRID_PATTERN.search(text):
+            return "Hybrid"
+        remote, onsite = REMOTE_PATTERN.search(text), ONSITE_PATTERN.search(text)
+        if remote and not onsite:
+            return "Remote"
+        if onsite and not remote:
+            return "On-site"
+        # Nothing stated (or both, without saying hybrid) - leave it to the LLM
+        return None
+
+    def find_min_years(self, text):
+        matches = [int(match.group(1)) for match in YEARS_PATTERN.finditer(text)]
+        return min(matches) if matches else None
+
+    def find_salary(self, text):
+        """Returns (salary dict or None, matched text or None)."""
+        for match in SALARY_PATTERN.finditer(text):
+            minimum = _to_number(match.group('min'), bool(match.group('min_k')))
+            maximum = _to_number(match.group('max'), bool(match.group('max_k') or match.group('min_k'))) \
+                if match.group('max') else None
+            tail = match.group('tail').lower()
+            if re.search(r"per hour|an hour|/hr|/hour|hourly|p/h", tail):
+                interval = "hourly"
+            elif re.search(r"per month|a month|/month|monthly", tail):
+                interval = "monthly"
+            elif re.search(r"per annum|a year|per year|/year|annual|p\.a\.|pa\b", tail) or minimum >= 10000:
+                interval = "yearly"
+            else:
+                # "$50" on its own could be anything, leave it to the LLM
+                continue
+            salary = {
+                "min_amount": minimum,
+                "max_amount": maximum,
+                "currency": CURRENCIES[match.group('currency')],
+                "interval": interval,
+            }
+            salary_text = (match.group(0)[:len(match.group(0)) - len(match.group('tail'))]).strip()
+            return salary, salary_text
+        return None, None
+
+    def find_seniority(self, title, years):
+        for level, pattern in SENIORITY_TITLE_PATTERNS:
+            if pattern.search(title):
+                return level
+        if years is None:
+            return None
+        if years >= 5:
+            return "Senior"
+        if years >= 2:
+            return "Mid"
+        return "Junior"
+
+
+def merge_analysis(resolved: dict, llm_dict: dict) -> dict:
+    """Combines rule and LLM answers. Tech lists are unioned; for anything else the LLM's answer wins."""
+    merged = {**resolved, **llm_dict}
+    for field in TECH_FIELDS:
+        if field in resolved and field in llm_dict:
+            merged[field] = list(dict.fromkeys((llm_dict[field] or []) + (resolved[field] or [])))
+    return merged
+
+
+if __name__ == "__main__":
+    # Reports how many jobs/tokens the pre-extractor would save on a queue file
+    import sys
+    from model import JobAnalysisComplex, sub_schema
+    from jobQueue import stream_records
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "data/raw/testData.jsonl"
+    full_schema_tokens = len(json.dumps(JobAnalysisComplex.model_json_schema())) // 4
+
+    for trust_local_tech in (False, True):
+        extractor = PreExtractor(trust_local_tech=trust_local_tech)
+        jobs = skipped = tokens_before = tokens_after = 0
+        for _, _, job in stream_records(input_file):
+            jobs += 1
+            prompt_tokens = len(f"{job.get('title')}\n\n{job.get('description')}") // 4
+            tokens_before += prompt_tokens + full_schema_tokens
+            _, unresolved = extractor.extract(job, JobAnalysisComplex)
+            if not unresolved:
+                skipped += 1
+                continue
+            schema_tokens = len(json.dumps(sub_schema(JobAnalysisComplex, unresolved).model_json_schema())) // 4
+            tokens_after += prompt_tokens + schema_tokens
+        mode = "trusting local tech" if trust_local_tech else "rules for scalar fields only"
+        print(f"--- {mode}: {skipped}/{jobs} jobs ({skipped / max(jobs, 1):.0%}) need no LLM call, "
+              f"tokens {tokens_before} -> {tokens_after} ({1 - tokens_after / max(tokens_before, 1):.0%} saved) ---")
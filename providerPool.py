@@ -0,0 +1,376 @@
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+from rateLimiter import TokenBucket
+
+# Models/keys the pool routes across. Entries whose key isn't set in the environment are left out.
+# `cheap` endpoints only take short postings unless everything else is down.
+DEFAULT_PROVIDERS = [
+    {"name": "flash-lite", "model": "google/gemini-2.5-flash-lite", "api_key_env": "GEMINI_API_KEY",
+     "requests_per_minute": 15, "tokens_per_minute": 250_000},
+    {"name": "flash-lite-2", "model": "google/gemini-2.5-flash-lite", "api_key_env": "GEMINI_API_KEY_2",
+     "requests_per_minute": 15, "tokens_per_minute": 250_000},
+    {"name": "flash-lite-cheap", "model": "google/gemini-2.0-flash-lite", "api_key_env": "GEMINI_API_KEY",
+     "requests_per_minute": 30, "tokens_per_minute": 1_000_000, "cheap": True},
+]
+# Prompts up to this many (estimated) tokens count as short postings and go to a cheap model first
+SHORT_POSTING_TOKENS = 600
+# Weight of the newest latency sample in the moving average
+EWMA_ALPHA = 0.3
+# Consecutive failures (not 429s) that open an endpoint's circuit, and how long it stays open
+FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 30.0
+MAX_BACKOFF = 60.0
+MAX_ATTEMPTS = 6
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for a 429 / quota error, whichever client library raised it."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+def is_provider_error(error: Exception) -> bool:
+    """
+    True for failures that say something about the endpoint (5xx, timeouts, dropped connections)
+    rather than the posting. Those count towards the circuit breaker and are retried elsewhere.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `threshold` failures in a row it opens and refuses calls
+    for `cooldown` seconds, then lets a single trial call through (half-open). The trial
+    closes it again on success, or reopens it on failure. Results of calls that started before
+    the circuit last opened or closed are ignored, so calls still in flight can't flip it back.
+    """
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.changed_at = 0.0
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allows(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial_running)
+
+    def before_call(self) -> float:
+        """Marks the trial call when half-open. Returns when the call started, to pass back with its result."""
+        if self.state == "half-open":
+            self.trial_running = True
+        return time.monotonic()
+
+    def record_success(self, started: float):
+        if started < self.changed_at:
+            return
+        if self.opened_at is not None:
+            # Nothing else is let through while open, so this is the trial
+            self.opened_at = None
+            self.changed_at = time.monotonic()
+        self.failures = 0
+        self.trial_running = False
+
+    def record_failure(self, started: float) -> bool:
+        """Returns True if this failure opened (or reopened) the circuit."""
+        if started < self.changed_at:
+            return False
+        self.failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = self.changed_at = time.monotonic()
+            return True
+        return False
+
+    def release(self, started: float):
+        """For a call that ended without saying anything about the endpoint (a 429, a bad posting)."""
+        if started >= self.changed_at and self.opened_at is not None:
+            self.trial_running = False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class ProviderEndpoint:
+    """One model + API key, with its own quota, latency estimate, 429 backoff and circuit breaker."""
+
+    def __init__(self, name: str, model: str = None, client=None, async_client=None, api_key: str = None,
+                 requests_per_minute: int = None, tokens_per_minute: int = None, cheap: bool = False):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        # Clients can be injected (e.g. fakeProvider); otherwise they're built on first use
+        self._client = client
+        self._async_client = async_client
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.cheap = cheap
+        self.breaker = CircuitBreaker()
+        self.latency = None
+        self.in_flight = 0
+        self.backoff = 0.0
+        self.paused_until = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            import instructor
+            self._client = instructor.from_provider(self.model, api_key=self.api_key)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import instructor
+            self._async_client = instructor.from_provider(self.model, api_key=self.api_key, async_client=True)
+        return self._async_client
+
+    @property
+    def model_label(self) -> str:
+        """The model this endpoint answers with, for cache keys and the store's model_name."""
+        return self.model or self.name
+
+    def available(self) -> bool:
+        return self.breaker.allows() and time.monotonic() >= self.paused_until
+
+    def ready_in(self) -> float:
+        """Seconds until this endpoint will take a call again (backoff or open circuit)."""
+        return max(self.paused_until - time.monotonic(), self.breaker.retry_in())
+
+    def quota_wait(self, prompt_tokens: int) -> float:
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket and prompt_tokens:
+            wait = max(wait, self.token_bucket.wait_time(prompt_tokens))
+        return wait
+
+    def expected_seconds(self, prompt_tokens: int, default_latency: float) -> float:
+        """How long a call sent here now would take: quota wait plus latency, queued behind what's in flight."""
+        latency = self.latency if self.latency is not None else default_latency
+        return self.quota_wait(prompt_tokens) + latency * (1 + self.in_flight)
+
+    def start_call(self, prompt_tokens: int) -> float:
+        """Claims quota for a call. Returns its start time for the record_* methods."""
+        if self.request_bucket:
+            self.request_bucket.consume(1)
+        if self.token_bucket and prompt_tokens:
+            self.token_bucket.consume(prompt_tokens)
+        self.calls += 1
+        self.in_flight += 1
+        return self.breaker.before_call()
+
+    def record_success(self, seconds: float, call_started: float):
+        self.in_flight -= 1
+        self.latency = seconds if self.latency is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency
+        self.breaker.record_success(call_started)
+        # Ease off the backoff rather than dropping it, the quota is probably still tight
+        self.backoff /= 2
+
+    def record_rate_limit(self, call_started: float) -> float:
+        """Doubles this endpoint's backoff (with jitter) and pauses it. Returns the delay."""
+        self.in_flight -= 1
+        self.rate_limited += 1
+        self.breaker.release(call_started)
+        self.backoff = min(MAX_BACKOFF, max(1.0, self.backoff * 2))
+        delay = self.backoff + random.uniform(0, self.backoff / 4)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def record_failure(self, call_started: float) -> bool:
+        """Returns True if this failure opened the endpoint's circuit."""
+        self.in_flight -= 1
+        self.failures += 1
+        return self.breaker.record_failure(call_started)
+
+
+class NoProviderAvailable(Exception):
+    """Every endpoint in the pool failed, or stayed rate limited, for all of MAX_ATTEMPTS."""
+
+
+class ProviderPool:
+    """
+    Routes extraction requests across several endpoints. Each call goes to the endpoint
+    expected to answer soonest, given its remaining quota and recent latency. A 429 pauses only
+    the endpoint that returned it, with a backoff that grows while it keeps happening, and a
+    run of 5xx/timeouts opens that endpoint's circuit for a while. Either way the request moves
+    on to the next best endpoint. Short postings go to `cheap` endpoints first; longer ones
+    only fall back to them when nothing else can take the call.
+    """
+
+    def __init__(self, endpoints, short_posting_tokens: int = SHORT_POSTING_TOKENS,
+                 max_attempts: int = MAX_ATTEMPTS, metrics=None):
+        if not endpoints:
+            raise ValueError("A provider pool needs at least one endpoint.")
+        self.endpoints = list(endpoints)
+        self.short_posting_tokens = short_posting_tokens
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.fallbacks = 0
+
+    @classmethod
+    def from_config(cls, providers=DEFAULT_PROVIDERS, **kwargs):
+        """Builds the pool from provider dicts (see DEFAULT_PROVIDERS), skipping any whose key isn't set."""
+        load_dotenv()
+        endpoints = []
+        for spec in providers:
+            api_key = os.getenv(spec["api_key_env"])
+            if not api_key:
+                continue
+            endpoints.append(ProviderEndpoint(spec["name"], spec["model"], api_key=api_key,
+                                              requests_per_minute=spec.get("requests_per_minute"),
+                                              tokens_per_minute=spec.get("tokens_per_minute"),
+                                              cheap=spec.get("cheap", False)))
+        if not endpoints:
+            raise ValueError("None of the provider API keys are set (e.g. GEMINI_API_KEY).")
+        return cls(endpoints, **kwargs)
+
+    def choose(self, prompt_tokens: int = 0, exclude=()):
+        """The endpoint to send this request to, or None if none can take it right now."""
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.available() and endpoint not in exclude]
+        if not candidates:
+            return None
+        short = prompt_tokens <= self.short_posting_tokens
+        preferred = [endpoint for endpoint in candidates if endpoint.cheap == short] or candidates
+        if preferred is candidates and not short and any(endpoint.cheap for endpoint in candidates):
+            # A long posting on a cheap model: better than waiting, but worth knowing about
+            self.fallbacks += 1
+            self._incr("provider_fallbacks")
+        known = [endpoint.latency for endpoint in self.endpoints if endpoint.latency is not None]
+        default_latency = min(known) if known else 1.0
+        return min(preferred, key=lambda endpoint: endpoint.expected_seconds(prompt_tokens, default_latency))
+
+    def _wait_time(self) -> float:
+        # Nothing can take a call: wait for the soonest endpoint to come back. The floor stops a
+        # half-open trial that's still running from turning this into a busy loop
+        return max(0.1, min(endpoint.ready_in() for endpoint in self.endpoints))
+
+    def create(self, response_model, messages, prompt_tokens: int = 0):
+        """Blocking call through the pool, for the sync and batched paths. Returns (result, endpoint that answered)."""
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            endpoint = self.choose(prompt_tokens, tried) or self.choose(prompt_tokens)
+            if endpoint is None:
+                time.sleep(self._wait_time())
+                endpoint = self.choose(prompt_tokens)
+                if endpoint is None:
+                    continue
+            time.sleep(endpoint.quota_wait(prompt_tokens))
+            call_started = endpoint.start_call(prompt_tokens)
+            started = time.perf_counter()
+            try:
+                result = endpoint.client.create(response_model=response_model, messages=messages)
+            except Exception as e:
+                last_error = e
+                self._record_error(endpoint, e, call_started)
+                tried.add(endpoint)
+                continue
+            endpoint.record_success(time.perf_counter() - started, call_started)
+            self._incr("provider_calls", provider=endpoint.name)
+            return result, endpoint
+        raise NoProviderAvailable(f"No provider answered after {self.max_attempts} attempts: {last_error}")
+
+    async def create_async(self, response_model, messages, prompt_tokens: int = 0):
+        """Same as create(), for the async engine. Only the chosen endpoint is waited on, never the loop."""
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            endpoint = self.choose(prompt_tokens, tried) or self.choose(prompt_tokens)
+            if endpoint is None:
+                await asyncio.sleep(self._wait_time())
+                endpoint = self.choose(prompt_tokens)
+                if endpoint is None:
+                    continue
+            # Claim the quota before sleeping so concurrent workers spread out instead of piling on
+            wait = endpoint.quota_wait(prompt_tokens)
+            call_started = endpoint.start_call(prompt_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            started = time.perf_counter()
+            try:
+                result = await endpoint.async_client.create(response_model=response_model, messages=messages)
+            except Exception as e:
+                last_error = e
+                self._record_error(endpoint, e, call_started)
+                tried.add(endpoint)
+                continue
+            endpoint.record_success(time.perf_counter() - started, call_started)
+            self._incr("provider_calls", provider=endpoint.name)
+            return result, endpoint
+        raise NoProviderAvailable(f"No provider answered after {self.max_attempts} attempts: {last_error}")
+
+    def _record_error(self, endpoint, error, call_started):
+        self._incr("provider_errors", provider=endpoint.name, error=type(error).__name__)
+        if is_rate_limit_error(error):
+            delay = endpoint.record_rate_limit(call_started)
+            print(f"⚠️ {endpoint.name} rate limited, pausing it {delay:.1f}s")
+        elif is_provider_error(error):
+            if endpoint.record_failure(call_started):
+                self._incr("provider_circuit_opened", provider=endpoint.name)
+                print(f"⚠️ {endpoint.name} failing ({type(error).__name__}), circuit open for "
+                      f"{endpoint.breaker.cooldown:.0f}s")
+        else:
+            # A bad response for this posting (e.g. validation), not a sick endpoint
+            endpoint.in_flight -= 1
+            endpoint.breaker.release(call_started)
+            raise error
+
+    def _incr(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.incr(name, **labels)
+
+    def report(self):
+        for endpoint in self.endpoints:
+            latency = f"{endpoint.latency * 1000:.0f}ms" if endpoint.latency is not None else "n/a"
+            print(f"--- {endpoint.name}: {endpoint.calls} calls, ewma {latency}, {endpoint.rate_limited} 429s, "
+                  f"{endpoint.failures} failures, circuit {endpoint.breaker.state} ---")
+        if self.fallbacks:
+            print(f"--- {self.fallbacks} long postings fell back to a cheap model ---")
+
+
+if __name__ == "__main__":
+    # Offline run of the async engine across three fake endpoints: a fast one that keeps
+    # hitting its quota, a slow reliable one, and a cheap one that goes down
+    import sys
+    import tempfile
+    from fakeProvider import AsyncFakeProvider
+    from analyseDescriptions import JobDescriptionAnalyzer
+    from jobStore import JobStore
+    from metrics import Metrics
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "data/raw/testData.jsonl"
+    pool = ProviderPool([
+        ProviderEndpoint("fast", async_client=AsyncFakeProvider(latency=(0.05, 0.15), error_rate=0.3, seed=1)),
+        ProviderEndpoint("slow", async_client=AsyncFakeProvider(latency=(0.3, 0.6), seed=2)),
+        ProviderEndpoint("cheap", async_client=AsyncFakeProvider(latency=(0.05, 0.1), server_error_rate=0.5, seed=3),
+                         cheap=True),
+    ])
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = JobDescriptionAnalyzer(provider_pool=pool, limit=10_000, use_cache=False, verbose=False,
+                                          store=JobStore(os.path.join(tmp, "jobs.sqlite"), migrate=False),
+                                          metrics=Metrics(json_path=os.path.join(tmp, "metrics.json")))
+        start = time.perf_counter()
+        analyzer.run_analysis_async(input_file, os.path.join(tmp, "jobs.csv"), concurrency=8)
+        print(f"--- {analyzer.processed_count} jobs in {time.perf_counter() - start:.1f}s ---")
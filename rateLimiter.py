@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Refills `per_minute` units every minute, holding at most `capacity` units."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they already are)."""
+        self._refill()
+        # A single request bigger than the bucket can never fit, so cap it
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Async limiter for requests-per-minute and tokens-per-minute quotas.
+    Either quota can be None to leave it unlimited.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 0):
+        # One waiter at a time so requests are released in arrival order
+        async with self._lock:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if self.request_bucket:
+                    wait = max(wait, self.request_bucket.wait_time(1))
+                if self.token_bucket and tokens:
+                    wait = max(wait, self.token_bucket.wait_time(tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket and tokens:
+                self.token_bucket.consume(tokens)
+
+    def penalise(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. after the provider returns a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
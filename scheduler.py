@@ -0,0 +1,168 @@
+import re
+import time
+from descriptionTrimmer import DESCRIPTION_TOKEN_BUDGET, estimate_tokens
+from jobQueue import stream_records
+from jobStore import decompress_description
+
+# How much each signal counts towards a job's priority. Set one to 0 to ignore it.
+PRIORITY_WEIGHTS = {"recency": 1.0, "query": 1.0, "title": 1.0, "length": 0.5}
+# Search queries (as stored by the scraper) we care most about, weighted 0-1
+QUERY_WEIGHTS = {"full stack developer": 1.0, "web developer": 0.8, "frontend developer": 0.8}
+# Title words that mark a posting as part of the slice we're tracking
+TITLE_KEYWORDS = ("full stack", "fullstack", "frontend", "front end", "front-end", "backend", "back end",
+                  "web", "python", "javascript", "typescript", "react", "node")
+# A job scraped one half-life later is worth one more point of priority
+RECENCY_HALF_LIFE_DAYS = 7
+# Rough size of one extraction's JSON output, for estimating a call's cost before making it
+EXPECTED_OUTPUT_TOKENS = 250
+SCORE_CHUNK = 1000
+
+
+class RunBudget:
+    """
+    Time and (estimated) cost caps for one analysis run. Either can be None to leave it open.
+    Costs are estimated from the prompt at the given USD per million token prices, so treat
+    max_cost as a soft ceiling.
+    """
+
+    def __init__(self, input_cost_per_million: float, output_cost_per_million: float,
+                 max_seconds: float = None, max_cost: float = None):
+        self.input_cost_per_million = input_cost_per_million
+        self.output_cost_per_million = output_cost_per_million
+        self.max_seconds = max_seconds
+        self.max_cost = max_cost
+        self.started = time.monotonic()
+        self.spent = 0.0
+        self.calls = 0
+        self.exhausted = False
+
+    def call_cost(self, prompt_tokens: int) -> float:
+        return (prompt_tokens * self.input_cost_per_million
+                + EXPECTED_OUTPUT_TOKENS * self.output_cost_per_million) / 1_000_000
+
+    def allows(self, prompt_tokens: int = 0) -> bool:
+        """Whether there's still time, and money for a call of this size. Once it says no, it stays no."""
+        out_of_time = self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds
+        out_of_money = self.max_cost is not None and self.spent + self.call_cost(prompt_tokens) > self.max_cost
+        self.exhausted = self.exhausted or out_of_time or out_of_money
+        return not self.exhausted
+
+    def spend(self, prompt_tokens: int):
+        self.spent += self.call_cost(prompt_tokens)
+        self.calls += 1
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        print(f"--- Budget: {self.calls} LLM calls, est. ${self.spent:.4f} spent"
+              f"{f' of ${self.max_cost:.4f}' if self.max_cost is not None else ''}, {elapsed:.1f}s"
+              f"{f' of {self.max_seconds:.1f}s' if self.max_seconds is not None else ''} ---")
+
+
+class JobScheduler:
+    """
+    Priority queue over the job store's queued jobs, so the analyzer takes the most valuable
+    postings first instead of going in file order. A job's priority is worked out once, when
+    it's first seen here, and kept in the store next to the job. The store is the queue state:
+    the scraper keeps adding jobs while an analysis run is going, and they're scored the next
+    time the run asks for work.
+
+    Recency is scored in log space (first_seen / half-life), so a score never needs updating
+    as the job gets older. The ordering between any two jobs stays the same over time.
+    """
+
+    def __init__(self, store, weights=None, query_weights=None, title_keywords=TITLE_KEYWORDS,
+                 half_life_days: float = RECENCY_HALF_LIFE_DAYS):
+        self.store = store
+        self.conn = store.conn
+        self.weights = {**PRIORITY_WEIGHTS, **(weights or {})}
+        self.query_weights = QUERY_WEIGHTS if query_weights is None else query_weights
+        self.title_pattern = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in title_keywords) + r")\b",
+                                        re.IGNORECASE) if title_keywords else None
+        self.half_life = half_life_days * 86400
+
+    def score(self, title, query, first_seen, description) -> float:
+        weights = self.weights
+        score = weights["recency"] * (first_seen or 0) / self.half_life
+        score += weights["query"] * self.query_weights.get((query or "").lower(), 0.0)
+        if self.title_pattern is not None:
+            matches = len(set(m.lower() for m in self.title_pattern.findall(title or "")))
+            score += weights["title"] * min(matches, 2) / 2
+        # Shorter postings are cheaper to extract, so they get a nudge up
+        tokens = estimate_tokens(description or "")
+        score += weights["length"] * (1 - min(tokens / DESCRIPTION_TOKEN_BUDGET, 1.0))
+        return score
+
+    def refresh(self) -> int:
+        """Scores queued jobs that don't have a priority yet. Returns how many were scored."""
+        scored = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, title, query, first_seen, description FROM jobs "
+                "WHERE status = 'queued' AND priority IS NULL AND description IS NOT NULL LIMIT ?",
+                (SCORE_CHUNK,)).fetchall()
+            if not rows:
+                return scored
+            with self.conn:
+                self.conn.executemany("UPDATE jobs SET priority = ? WHERE id = ?", [
+                    (self.score(title, query, first_seen, decompress_description(blob)), job_id)
+                    for job_id, title, query, first_seen, blob in rows])
+            scored += len(rows)
+
+    def reprioritise(self):
+        """Re-scores the whole backlog, e.g. after changing the weights."""
+        with self.conn:
+            self.conn.execute("UPDATE jobs SET priority = NULL WHERE status = 'queued'")
+        return self.refresh()
+
+    def next_jobs(self, count: int = 1, exclude=()):
+        """The `count` highest priority queued jobs, as queue records, skipping any ids in `exclude`."""
+        self.refresh()
+        rows = self.conn.execute(
+            "SELECT id, title, company, location, description, query FROM jobs "
+            "WHERE status = 'queued' AND priority IS NOT NULL ORDER BY priority DESC LIMIT ?",
+            (count + len(exclude),)).fetchall()
+        jobs = []
+        for job_id, title, company, location, blob, query in rows:
+            if job_id in exclude:
+                continue
+            jobs.append({"id": job_id, "title": title, "company": company, "location": location,
+                         "description": decompress_description(blob), "query": query})
+        return jobs[:count]
+
+    def pending(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND description IS NOT NULL").fetchone()[0]
+
+    def import_queue(self, path: str, chunk: int = 500) -> int:
+        """
+        Loads a queue file into the store, for jobs scraped before descriptions were kept there.
+        Already known jobs only get their description filled in.
+        """
+        batch, count = [], 0
+        for _, _, job in stream_records(path):
+            batch.append(job)
+            if len(batch) >= chunk:
+                self.store.add_queued(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.store.add_queued(batch)
+            count += len(batch)
+        return count
+
+
+if __name__ == "__main__":
+    # Loads the queue file into the store and shows the top of the backlog
+    import os
+    from config import QUEUE_FILE
+    from jobStore import JobStore
+
+    store = JobStore()
+    scheduler = JobScheduler(store)
+    if os.path.exists(QUEUE_FILE):
+        print(f"--- Imported {scheduler.import_queue(QUEUE_FILE)} jobs from {QUEUE_FILE} ---")
+    started = time.perf_counter()
+    scored = scheduler.refresh()
+    print(f"--- Scored {scored} jobs in {time.perf_counter() - started:.2f}s, {scheduler.pending()} pending ---")
+    for job in scheduler.next_jobs(15):
+        print(f"{job['title'][:50]: <52}{job['company'][:25]: <27}{job['query'] or '-'}")
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+from config import QUEUE_FILE
+
+CHECKPOINT_FILE = os.path.join(os.path.dirname(QUEUE_FILE), "scrape_checkpoint.json")
+
+
+class ScrapeCheckpoint:
+    """
+    Records how far each search URL got, so a crashed run resumes where it stopped.
+    Per URL we keep the sort order, the pages finished, the highest contiguous finished page
+    and a cursor (the URL of the next page to scrape).
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE):
+        self.path = path
+        self.state = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"--- Ignoring unreadable checkpoint {self.path} ---")
+
+    def get(self, url, sort="date"):
+        """The saved progress for this search, or None if there is none for this sort order."""
+        entry = self.state.get(url)
+        if entry is None or entry.get("sort") != sort:
+            return None
+        return entry
+
+    def completed_pages(self, url, sort="date"):
+        entry = self.get(url, sort)
+        return set(entry["completed_pages"]) if entry else set()
+
+    def mark_page_done(self, url, page_num, sort="date", cursor=None):
+        entry = self.get(url, sort) or {"sort": sort, "completed_pages": [], "last_completed_page": 0}
+        completed = set(entry["completed_pages"]) | {page_num}
+        last = entry["last_completed_page"]
+        while last + 1 in completed:
+            last += 1
+        entry.update({
+            "completed_pages": sorted(completed),
+            "last_completed_page": last,
+            "cursor": cursor or entry.get("cursor"),
+            "updated": time.time(),
+        })
+        self.state[url] = entry
+        self._write()
+
+    def clear(self, url):
+        if self.state.pop(url, None) is not None:
+            self._write()
+
+    def _write(self):
+        # Write-then-rename so the checkpoint itself can't be torn by a crash
+        checkpoint_dir = os.path.dirname(self.path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
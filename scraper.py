@@ -1,16 +1,82 @@
-import csv
-import json
 import time
 import os
 import random
+import re
+from urllib.parse import parse_qs, urlparse
 from playwright.sync_api import sync_playwright
 from config import QUEUE_FILE, DATABASE_FILE
+from jobStore import JobStore
+from detailParser import is_detail_response, parse_job_detail
+from jobQueue import append_record, repair_queue
+from scrapeCheckpoint import ScrapeCheckpoint
+from metrics import METRICS
+from nearDuplicates import NearDuplicateIndex
+
+DEFAULT_URL = "https://ie.indeed.com/jobs?q=web%20developer&l=Ireland"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+STEALTH_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+# Indeed selectors, shared with parallelScraper
+CARD_SELECTOR = '.job_seen_beacon'
+TITLE_SELECTOR = 'h2[data-testid="jobsearch-JobInfoHeader-title"]'
+COMPANY_SELECTOR = '[data-testid="inlineHeader-companyName"]'
+LOCATION_SELECTOR = '[data-testid="inlineHeader-companyLocation"]'
+DESCRIPTION_SELECTOR = '#jobDescriptionText'
+NEXT_PAGE_SELECTOR = 'a[data-testid="pagination-page-next"]'
+# What Indeed shows once a search has run out of results
+NO_RESULTS_SELECTOR = '.jobsearch-NoResult-messageContainer'
+POPUP_CLOSE_SELECTOR = 'button[aria-label="close"]'
+DETAIL_TIMEOUT = 5000
+# Reads the whole details pane in one round trip, so the sync and async scrapers share it
+READ_DETAILS_SCRIPT = """([title, company, location, description]) => {
+    const text = (selector) => document.querySelector(selector)?.innerText ?? null;
+    return {title: text(title), company: text(company), location: text(location), description: text(description)};
+}"""
+DETAILS_SELECTORS = [TITLE_SELECTOR, COMPANY_SELECTOR, LOCATION_SELECTOR, DESCRIPTION_SELECTOR]
+
+def search_query(url):
+    """The search terms of an Indeed results URL ("web developer"), stored with each job for the scheduler."""
+    terms = parse_qs(urlparse(url).query).get("q")
+    return terms[0].strip().lower() if terms else None
+
+def job_from_details(job_id, details):
+    """The queue record for what READ_DETAILS_SCRIPT read off the details pane."""
+    return {
+        "id": job_id,
+        "title": details["title"].replace("\n", " ").replace("- job post", "").strip(),
+        "company": details["company"] or "Unknown Company",
+        "location": details["location"] or "Unknown Location",
+        "description": details["description"]
+    }
+
+
+def report_scrape_metrics(metrics):
+    """Prints per-card/page latency percentiles for each extraction path and exports the metrics."""
+    metrics.report("scrape_")
+    metrics.export()
 
 class IndeedScraper:
-    def __init__(self, url=None, page_limit=1):
-        self.url = url or "https://ie.indeed.com/jobs?q=web%20developer&l=Ireland"
+    def __init__(self, url=None, page_limit=1, headless=False, use_network=True, card_delay=None, har_path=None,
+                 store=None, checkpoint=None, verbose=True, metrics=None,
+                 skip_near_duplicates=True):
+        self.url = url or DEFAULT_URL
         self.page_limit = page_limit
+        self.headless = headless
+        # Read details from the viewjob response rather than the rendered pane where possible
+        self.use_network = use_network
+        # Optional (min, max) human pause per card; by default we only wait on real page events
+        self.card_delay = card_delay
+        # Replay a recorded HAR instead of hitting the live site
+        self.har_path = har_path
+        # Per-card console output; counts and timings always go to the metrics
+        self.verbose = verbose
+        self.metrics = metrics or METRICS
+        # Reposts and lightly edited copies are flagged in the store instead of being queued
+        self.skip_near_duplicates = skip_near_duplicates
+        self.duplicates = None
         self.processed_ids = set()
+        self.store = store
+        self.checkpoint = checkpoint or ScrapeCheckpoint()
         
         # Generate a timestamped filename for this run
         self.output_file = QUEUE_FILE
@@ -21,42 +87,15 @@ class IndeedScraper:
             os.makedirs(queue_dir, exist_ok=True)
 
     def load_processed_ids(self):
-        if not os.path.exists(self.output_file):
-            return #needed?
-            
-        with open(self.output_file, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    if "id" in data:
-                        self.processed_ids.add(data["id"])
-                except json.JSONDecodeError:
-                    pass
-        print('skipped IDs from queue file: ',  self.processed_ids)
-        databaseIDs = set()
-                
-        with open(self.databaseFile, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Skip the header row
-            next(reader, None) 
-            for row in reader:
-                if row:  # Ensure the row isn't empty
-                    # Assuming ID is the first element (index 0)
-                   self.processed_ids.add(row[0])
-                   databaseIDs.add(row[0])
-                   
-        print('skipped IDs from database file: ', (databaseIDs))
-                
-        
-        print("Current processed IDS: ", self.processed_ids)
-        #queue ids
-        #self.current_output_file - read ids.
-        #self.database_file - read ids.
-        
-        #return
-        
-        #
-        return ()
+        """Opens the job store. Ids are looked up there per card rather than loaded up front."""
+        if self.store is None:
+            self.store = JobStore()
+        if self.skip_near_duplicates:
+            self.duplicates = NearDuplicateIndex(self.store)
+        print(f"--- Job store: {self.store.counts()} ---")
+
+    def is_processed(self, job_id):
+        return job_id in self.processed_ids or self.store.has_job(job_id)
 
     def get_job_id_from_card(self, card):
         """Extracts the unique data-jk ID from a job card."""
@@ -69,24 +108,25 @@ class IndeedScraper:
     def close_popup(self, page):
         """Attempts to close the 'Save this search' or email popup."""
         try:
-            close_btn = page.locator('button[aria-label="close"]')
+            close_btn = page.locator(POPUP_CLOSE_SELECTOR)
             if close_btn.is_visible():
                 close_btn.click()
                 print("--- Closed a Popup ---")
-                time.sleep(1)
+                close_btn.wait_for(state="hidden", timeout=2000)
         except:
             pass
 
     def go_to_next_page(self, page):
         """Handles pagination."""
         try:
-            next_button = page.locator('a[data-testid="pagination-page-next"]')
+            next_button = page.locator(NEXT_PAGE_SELECTOR)
             if next_button.count() > 0:
                 next_button.scroll_into_view_if_needed()
+                old_url = page.url
                 next_button.click()
-                # Wait for the URL to change or page to settle
-                page.wait_for_load_state("domcontentloaded") 
-                time.sleep(3) 
+                # Wait for the URL to change and the new cards to render
+                page.wait_for_url(lambda url: url != old_url)
+                page.wait_for_selector(CARD_SELECTOR, timeout=10000)
                 return True
             return False
         except Exception as e:
@@ -96,67 +136,90 @@ class IndeedScraper:
     def scrape_current_page(self, page, file_handle):
         """Iterates through all cards on the current view."""
         # Wait for cards to ensure page is loaded
-        page.wait_for_selector('.job_seen_beacon', timeout=10000)
-        job_cards = page.locator('.job_seen_beacon').all()
+        page.wait_for_selector(CARD_SELECTOR, timeout=10000)
+        job_cards = page.locator(CARD_SELECTOR).all()
         
         print(f"Found {len(job_cards)} jobs on this page.")
+        self.metrics.incr("scrape_pages")
 
         for card in job_cards:
             try:
-                # Random Human Pause
-                time.sleep(random.uniform(0.8, 1.5))
+                if self.card_delay:
+                    time.sleep(random.uniform(*self.card_delay))
+                started = time.perf_counter()
                 
                 card.scroll_into_view_if_needed()
                 
                 job_id = self.get_job_id_from_card(card)
+                self.metrics.incr("scrape_cards_seen")
                 
                 # --- DEDUPLICATION CHECK ---
-                if job_id in self.processed_ids:
-                    print(f"Skipping {job_id} (Already Scraped)")
+                if self.is_processed(job_id):
+                    self.metrics.incr("scrape_jobs_skipped")
+                    # Still listed, which is what the trends' open postings count goes on
+                    self.store.mark_seen([job_id])
+                    if self.verbose:
+                        print(f"Skipping {job_id} (Already Scraped)")
                     continue 
                 
-                # Click to load details
-                card.click()
-                
-                # 1. Wait for title to ensure details pane loaded
-                page.locator('h2[data-testid="jobsearch-JobInfoHeader-title"]').wait_for(state="visible", timeout=5000)
-                
-                # 2. Extract Metadata
-                title_raw = page.locator('h2[data-testid="jobsearch-JobInfoHeader-title"]').first.inner_text()
-                title = title_raw.replace("\n", " ").replace("- job post", "").strip()
-                try:
-                    company = page.locator('[data-testid="inlineHeader-companyName"]').first.inner_text()
-                except:
-                    company = "Unknown Company"
-                    
-                try:
-                    location = page.locator('[data-testid="inlineHeader-companyLocation"]').first.inner_text()
-                except:
-                    location = "Unknown Location"
-
-                # 3. Extract Description
-                description = page.locator('#jobDescriptionText').inner_text()
-                
-                # 4. Save Data
-                job_data = {
-                    "id": job_id,
-                    "title": title,
-                    "company": company,
-                    "location": location,
-                    "description": description
-                }
-                
-                # Write JSON line
-                file_handle.write(json.dumps(job_data) + "\n")
-                
+                job_data, method = self.extract_job(page, card, job_id)
+                self.metrics.observe("scrape_card_seconds", time.perf_counter() - started, method=method)
                 # Update processed list so we don't scrape it again *in this run*
                 self.processed_ids.add(job_id)
+                job_data['query'] = search_query(self.url)
+
+                if self.duplicates is not None:
+                    original = self.duplicates.check_and_flag(job_data)
+                    if original is not None:
+                        self.metrics.incr("scrape_near_duplicates")
+                        if self.verbose:
+                            print(f"Skipping {job_id} (Near-duplicate of {original})")
+                        continue
                 
-                print(f"Saved: {title[:30]}...")
+                # Write JSON line (fsynced, so a crash never leaves a torn record)
+                with self.metrics.timer("scrape_write_seconds"):
+                    append_record(file_handle, job_data)
+                    self.store.add_queued([job_data])
+                self.metrics.incr("scrape_jobs_saved", method=method)
+                
+                if self.verbose:
+                    print(f"Saved: {job_data['title'][:30]}...")
+
+            except Exception as e:
+                # Skip failed cards to keep the scraper moving, but count them
+                self.metrics.incr("scrape_card_errors", error=type(e).__name__)
 
+    def extract_job(self, page, card, job_id):
+        """
+        Clicks the card and reads the details from the viewjob network response.
+        Falls back to the rendered details pane if the response is missing or unparseable.
+        Returns (job_data, method).
+        """
+        if self.use_network:
+            try:
+                with page.expect_response(lambda r: is_detail_response(r.url, job_id),
+                                          timeout=DETAIL_TIMEOUT) as response_info:
+                    card.click()
+                job_data = parse_job_detail(response_info.value.text(), job_id)
+                if job_data:
+                    return job_data, "network"
             except Exception:
-                # Silently skip failed cards to keep the scraper moving
+                # No matching response; the click has still happened so the pane is loading
                 pass
+        else:
+            card.click()
+        return self.extract_job_from_dom(page, job_id), "dom"
+
+    def extract_job_from_dom(self, page, job_id):
+        """Reads the details pane once it is showing this job."""
+        try:
+            # The search URL picks up vjk=<id> once the pane switches to the clicked job
+            page.wait_for_url(re.compile(f"vjk={re.escape(job_id)}"), timeout=DETAIL_TIMEOUT)
+        except Exception:
+            pass
+        page.locator(TITLE_SELECTOR).wait_for(state="visible", timeout=DETAIL_TIMEOUT)
+        page.locator(DESCRIPTION_SELECTOR).wait_for(state="visible", timeout=DETAIL_TIMEOUT)
+        return job_from_details(job_id, page.evaluate(READ_DETAILS_SCRIPT, DETAILS_SELECTORS))
 
     def sortByDate(self, page):
         try:
@@ -177,57 +240,77 @@ class IndeedScraper:
             # The URL usually changes to include "&sort=date"
             page.wait_for_url("*sort=date*")
             
-            # 5. Another small pause to let the new list settle
-            time.sleep(random.uniform(2, 4))
+            # 5. Let the new list render before we start reading cards
+            page.wait_for_selector(CARD_SELECTOR, timeout=10000)
 
         except Exception as e:
             print(f"Could not sort by date: {e}")
     # You might want to decide here: do you crash? or just scrape the relevance list?
-    def run(self):
-        """Main execution method."""
+    def run(self, resume=True):
+        """Main execution method. With `resume`, picks up from the last checkpointed page of this URL."""
         
         # Load history before starting
         self.load_processed_ids()
+        repair_queue(self.output_file)
+        progress = self.checkpoint.get(self.url) if resume else None
+        start_page = 1
+        if progress and progress.get("cursor") and progress["last_completed_page"] < self.page_limit:
+            start_page = progress["last_completed_page"] + 1
         
         with sync_playwright() as p:
             # 1. Launch Browser
             browser = p.chromium.launch(
-                headless=False,
+                headless=self.headless,
                 args=["--disable-blink-features=AutomationControlled", "--start-maximized"]
             )
             
             # 2. Context with Real User Agent
             context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                user_agent=USER_AGENT,
                 viewport={"width": 1920, "height": 1080}
             )
+            if self.har_path:
+                context.route_from_har(self.har_path, not_found="fallback")
             
             # 3. Stealth Script
             page = context.new_page()
-            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            page.add_init_script(STEALTH_SCRIPT)
 
-            print(f"--- Navigating to {self.url} ---")
-            page.goto(self.url)
-            time.sleep(random.uniform(1, 3))
-            self.sortByDate(page)
+            if start_page > 1:
+                print(f"--- Resuming at page {start_page} from checkpoint: {progress['cursor']} ---")
+                page.goto(progress["cursor"])
+                page.wait_for_selector(CARD_SELECTOR, timeout=10000)
+            else:
+                print(f"--- Navigating to {self.url} ---")
+                page.goto(self.url)
+                page.wait_for_selector(CARD_SELECTOR, timeout=10000)
+                if "sort=date" not in page.url:
+                    self.sortByDate(page)
 
             # Open the file for writing
             with open(self.output_file, "a", encoding="utf-8") as f:
                 
                 # Loop through pages
-                for page_num in range(1, self.page_limit + 1):
+                for page_num in range(start_page, self.page_limit + 1):
                     print(f"\n--- Processing Page {page_num} of {self.page_limit} ---")
                     
                     self.close_popup(page)
-                    self.scrape_current_page(page, f)
+                    with self.metrics.timer("scrape_page_seconds"):
+                        self.scrape_current_page(page, f)
                     
                     # Pagination logic
                     if page_num < self.page_limit:
                         if not self.go_to_next_page(page):
                             print("Could not find 'Next' button. Stopping early.")
                             break
+                        # Only checkpoint once the next page is loaded, so the cursor is usable
+                        self.checkpoint.mark_page_done(self.url, page_num, cursor=page.url)
+
+            # Finished this search, so the next run starts fresh
+            self.checkpoint.clear(self.url)
 
             print(f"\n--- Scraping Complete. Data saved to {self.output_file} ---")
+            report_scrape_metrics(self.metrics)
             browser.close()
 
 # --- Usage ---
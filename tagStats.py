@@ -0,0 +1,180 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from config import DATABASE_FILE
+from jobStore import JobStore, LIST_FIELDS, STORE_FILE
+from techTerms import canonicalize
+from jobDataset import read_table
+
+CUBE_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "tag_stats.parquet")
+WATERMARK_KEY = "tag_cube_watermark"
+DIMENSIONS = ['field', 'tag', 'seniority_level', 'work_setting', 'week']
+
+
+def file_for_store(store_path: str, default_path: str) -> str:
+    """
+    Where an aggregate of a job store lives. Its watermark is kept in the store, so each store needs
+    its own file: `default_path` for the main store, a sibling named after the store for any other.
+    """
+    if os.path.abspath(store_path) == os.path.abspath(STORE_FILE):
+        return default_path
+    stem = os.path.splitext(store_path)[0]
+    return f"{stem}_{os.path.basename(default_path)}"
+
+
+def _as_lists(series: pd.Series) -> pd.Series:
+    """List columns come back as lists/arrays from the store or Parquet, or '; ' joined strings from the CSV."""
+    if series.dropna().map(lambda v: isinstance(v, (list, np.ndarray))).all():
+        return series
+    return series.fillna("").astype(str).str.split(";")
+
+
+def explode_tags(df: pd.DataFrame, fields=LIST_FIELDS) -> pd.DataFrame:
+    """One row per (job, field, tag), built with explode rather than a Python loop per cell."""
+    dims = pd.DataFrame({
+        'seniority_level': df.get('seniority_level', pd.Series("Unknown", index=df.index)).fillna("Unknown"),
+        'work_setting': df.get('work_setting', pd.Series("Unknown", index=df.index)).fillna("Unknown"),
+        'week': df.get('week', pd.Series("Unknown", index=df.index)).fillna("Unknown"),
+    })
+    frames = []
+    for field in fields:
+        if field not in df:
+            continue
+        tags = _as_lists(df[field]).explode().dropna().astype(str).str.strip()
+        tags = tags[tags != ""]
+        # Canonicalise each distinct spelling once, then map the whole column
+        canonical = {tag: canonicalize(tag) for tag in tags.unique()}
+        tags = tags.map(canonical)
+        frame = dims.loc[tags.index].copy()
+        frame['field'] = field
+        frame['tag'] = tags.values
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=DIMENSIONS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def count_tags(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates a jobs frame into the cube: counts per field, tag, seniority, work setting and week."""
+    exploded = explode_tags(df)
+    if exploded.empty:
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    return exploded.groupby(DIMENSIONS, observed=True).size().reset_index(name='count')
+
+
+def merge_cubes(*cubes) -> pd.DataFrame:
+    cubes = [cube for cube in cubes if cube is not None and not cube.empty]
+    if not cubes:
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    combined = pd.concat(cubes, ignore_index=True)
+    return combined.groupby(DIMENSIONS, observed=True)['count'].sum().reset_index()
+
+
+def records_frame(rows) -> pd.DataFrame:
+    """Builds a jobs frame from store rows of (record, first_seen, analysed_at)."""
+    records = []
+    for record, first_seen, _ in rows:
+        record['week'] = week_of(first_seen)
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def week_of(timestamp):
+    if timestamp is None:
+        return "Unknown"
+    # Weeks are labelled by their Monday
+    day = pd.Timestamp(timestamp, unit='s').normalize()
+    return (day - pd.Timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+
+
+def load_cube(path: str = CUBE_FILE) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    return pd.read_parquet(path)
+
+
+def save_cube(cube: pd.DataFrame, path: str = CUBE_FILE):
+    cube_dir = os.path.dirname(path)
+    if cube_dir:
+        os.makedirs(cube_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    cube.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update_cube(store: JobStore = None, path: str = None, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Folds jobs analysed since the last update into the cube and saves it (by default the store's own
+    cube, see file_for_store). Only new rows are read, so the cost depends on what's landed, not the
+    size of the database.
+    """
+    store = store or JobStore()
+    path = path or file_for_store(store.path, CUBE_FILE)
+    # No watermark (a new store, or rows changed under it) means nothing can be trusted to be in the cube
+    watermark = store.get_meta(WATERMARK_KEY)
+    rebuild = rebuild or watermark is None
+    watermark = 0.0 if rebuild else float(watermark)
+    cube = None if rebuild else load_cube(path)
+
+    rows = list(store.analysed_since(watermark))
+    if not rows and cube is not None and os.path.exists(path):
+        return cube
+    cube = merge_cubes(cube, count_tags(records_frame(rows)))
+    save_cube(cube, path)
+    if rows:
+        store.set_meta(WATERMARK_KEY, rows[-1][2])
+    print(f"--- Tag cube: folded in {len(rows)} jobs, {len(cube)} rows stored ---")
+    return cube
+
+
+def cube_from_csv(csv_path: str) -> pd.DataFrame:
+    """Builds a cube straight from a database CSV (no week information)."""
+    return count_tags(pd.read_csv(csv_path))
+
+
+def cube_from_dataset(path: str) -> pd.DataFrame:
+    """
+    Builds a cube from the Parquet dataset (no week information). Only the tag and dimension
+    columns are read, and the lists are flattened and counted in Arrow, so canonicalisation
+    runs once per distinct (tag, seniority, work setting) rather than once per row.
+    """
+    table = read_table(path, LIST_FIELDS + ['seniority_level', 'work_setting'])
+    frames = []
+    for field in LIST_FIELDS:
+        if field not in table.column_names:
+            continue
+        column = table.column(field)
+        parents = pc.list_parent_indices(column)
+        long = pa.table({
+            'tag': pc.utf8_trim_whitespace(pc.list_flatten(column)),
+            **{dim: (table.column(dim) if dim in table.column_names else pa.nulls(len(table), pa.string())).take(parents)
+               for dim in ('seniority_level', 'work_setting')},
+        })
+        counts = long.group_by(['tag', 'seniority_level', 'work_setting']).aggregate([([], 'count_all')]).to_pandas()
+        counts['tag'] = counts['tag'].map(lambda tag: canonicalize(tag) if tag else None)
+        counts['field'] = field
+        frames.append(counts.rename(columns={'count_all': 'count'}))
+    if not frames:
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    cube = pd.concat(frames, ignore_index=True).dropna(subset=['tag'])
+    cube[['seniority_level', 'work_setting']] = cube[['seniority_level', 'work_setting']].fillna("Unknown")
+    cube['week'] = "Unknown"
+    # Spellings that canonicalised to the same tag get folded together here
+    return merge_cubes(cube)
+
+
+def top_tags(cube: pd.DataFrame, field: str, n: int = 10, **filters) -> pd.Series:
+    """Top `n` tags for a field, optionally filtered, e.g. top_tags(cube, 'languages', seniority_level='Senior')."""
+    subset = cube[cube['field'] == field]
+    for column, value in filters.items():
+        subset = subset[subset[column] == value]
+    # An empty cube has an object count column, which nlargest refuses
+    return subset.groupby('tag')['count'].sum().astype('int64').nlargest(n)
+
+
+if __name__ == "__main__":
+    cube = update_cube()
+    for field in LIST_FIELDS:
+        print(f"\n{field}:\n{top_tags(cube, field).to_string()}")
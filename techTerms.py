@@ -0,0 +1,233 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+# Canonical id -> other spellings we've seen the LLM produce
+ALIASES = {
+    "javascript": ["js", "java script", "ecmascript", "es6", "vanilla js", "vanilla javascript"],
+    "typescript": ["ts"],
+    "python": ["python3", "python 3", "py"],
+    "java": ["java 8", "java 11", "java 17"],
+    "c#": ["csharp", "c sharp"],
+    "c++": ["cpp", "c plus plus"],
+    "go": ["golang"],
+    "rust": [],
+    "php": [],
+    "ruby": [],
+    "kotlin": [],
+    "swift": [],
+    "sql": [],
+    "html": ["html5", "html 5"],
+    "css": ["css3", "css 3"],
+    "sass": ["scss"],
+    "react": ["react.js", "reactjs", "react js"],
+    "react native": ["react-native", "reactnative"],
+    "angular": ["angular2", "angular 2+", "angular 2"],
+    "angularjs": ["angular.js", "angular js"],
+    "vue.js": ["vue", "vuejs", "vue js", "vue 3"],
+    "next.js": ["nextjs", "next js"],
+    "nuxt.js": ["nuxt", "nuxtjs"],
+    "svelte": [],
+    "node.js": ["node", "nodejs", "node js"],
+    "express": ["express.js", "expressjs"],
+    "nestjs": ["nest.js", "nest"],
+    "jquery": [],
+    "bootstrap": [],
+    "tailwind css": ["tailwind", "tailwindcss"],
+    "django": [],
+    "flask": [],
+    "fastapi": ["fast api"],
+    "spring boot": ["springboot"],
+    "ruby on rails": ["ror"],
+    "laravel": [],
+    ".net": ["dotnet", "dot net", ".net core", "dotnet core", "asp.net", "asp.net core"],
+    "wordpress": ["wp"],
+    "graphql": [],
+    "rest": ["rest api", "restful", "restful apis", "rest apis"],
+    "postgresql": ["postgres", "psql"],
+    "mysql": [],
+    "sql server": ["mssql", "microsoft sql server", "ms sql"],
+    "mongodb": ["mongo"],
+    "redis": [],
+    "elasticsearch": ["elastic search"],
+    "docker": [],
+    "kubernetes": ["k8s"],
+    "terraform": [],
+    "git": [],
+    "github": [],
+    "github actions": [],
+    "gitlab": [],
+    "jenkins": [],
+    "ci/cd": ["cicd", "ci cd", "ci/cd pipelines"],
+    "jira": [],
+    "figma": [],
+    "webpack": [],
+    "vite": [],
+    "jest": [],
+    "cypress": [],
+    "playwright": [],
+    "selenium": [],
+    "linux": [],
+    "firebase": [],
+    "aws": ["amazon web services"],
+    "azure": ["microsoft azure"],
+    "gcp": ["google cloud", "google cloud platform"],
+}
+
+# Which analysis field each canonical term belongs in, for the local pre-extractor
+FIELD_TERMS = {
+    "languages": ["javascript", "typescript", "python", "java", "c#", "c++", "go", "rust", "php", "ruby",
+                  "kotlin", "swift", "sql", "html", "css", "sass"],
+    "frameworks": ["react", "react native", "angular", "angularjs", "vue.js", "next.js", "nuxt.js", "svelte",
+                   "node.js", "express", "nestjs", "jquery", "bootstrap", "tailwind css", "django", "flask",
+                   "fastapi", "spring boot", "ruby on rails", "laravel", ".net"],
+    "tools": ["wordpress", "graphql", "rest", "postgresql", "mysql", "sql server", "mongodb", "redis",
+              "elasticsearch", "docker", "kubernetes", "terraform", "git", "github", "github actions", "gitlab",
+              "jenkins", "ci/cd", "jira", "figma", "webpack", "vite", "jest", "cypress", "playwright", "selenium",
+              "linux", "firebase"],
+    "cloud_platforms": ["aws", "azure", "gcp"],
+}
+TERM_FIELDS = {term: field for field, terms in FIELD_TERMS.items() for term in terms}
+
+# Typos are only fixed between names this long (squashed). Shorter ones are a letter away from real
+# words and other tech: flash/flask, sigma/figma, nodes/node
+MIN_FUZZY_LENGTH = 8
+# Names at least this long may be up to 2 edits out, shorter ones 1
+LONG_FUZZY_LENGTH = 12
+# Real technologies that look like a known one, or are a different product of the same family.
+# They keep their own tag rather than being folded into the lookalike.
+DISTINCT_TERMS = {"grails", "sveltekit", "spring", "spring framework", "spring mvc", "rails", "preact"}
+
+
+def squash(tag: str) -> str:
+    """Lookup key: lowercase with spaces, dots, dashes and underscores removed ('React.js' -> 'reactjs')."""
+    return re.sub(r"[\s.\-_]+", "", str(tag).lower())
+
+
+def _trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, bailing out early once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TermIndex:
+    """Exact alias lookup, with a trigram-indexed edit-distance fallback for typos."""
+
+    def __init__(self, aliases=ALIASES):
+        self.exact = {}
+        for canonical, spellings in aliases.items():
+            for spelling in [canonical] + spellings:
+                self.exact[squash(spelling)] = canonical
+        self.distinct = {squash(term) for term in DISTINCT_TERMS}
+        self.trigram_index = defaultdict(set)
+        for key in self.exact:
+            if len(key) >= MIN_FUZZY_LENGTH:
+                for gram in _trigrams(key):
+                    self.trigram_index[gram].add(key)
+
+    def fuzzy_match(self, key: str):
+        # Short names are too easy to confuse (java/javascript, sass/saas), so only fix longer ones
+        if len(key) < MIN_FUZZY_LENGTH or key in self.distinct:
+            return None
+        limit = 1 if len(key) < LONG_FUZZY_LENGTH else 2
+        grams = _trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] += 1
+        best, best_distance = None, limit + 1
+        # Only candidates sharing a decent number of trigrams are worth an edit-distance check
+        for candidate, count in shared.items():
+            if count * 2 < len(grams):
+                continue
+            distance = edit_distance(key, candidate, limit)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return self.exact[best] if best is not None else None
+
+    def canonical(self, tag: str) -> str:
+        cleaned = re.sub(r"\s+", " ", str(tag)).strip().lower()
+        key = squash(cleaned)
+        if key in self.exact:
+            return self.exact[key]
+        return self.fuzzy_match(key) or cleaned
+
+
+_index = TermIndex()
+
+
+@lru_cache(maxsize=100_000)
+def canonicalize(tag: str) -> str:
+    """Maps a raw tag to its canonical id. Unknown tags come back lowercased and trimmed."""
+    return _index.canonical(tag)
+
+
+def canonicalize_tags(tags):
+    """Canonical ids for a list of tags, de-duplicated and in their original order."""
+    seen = []
+    for tag in tags or []:
+        if not str(tag).strip():
+            continue
+        canonical = canonicalize(tag)
+        if canonical not in seen:
+            seen.append(canonical)
+    return seen
+
+
+def canonicalize_record(record: dict, fields) -> dict:
+    for field in fields:
+        if isinstance(record.get(field), list):
+            record[field] = canonicalize_tags(record[field])
+    return record
+
+
+if __name__ == "__main__":
+    # Re-applies the alias list to everything already in the database
+    import csv
+    import os
+    from config import DATABASE_FILE
+    from jobStore import JobStore, LIST_FIELDS
+    from tagStats import update_cube
+    from jobDataset import dataset_exists, export_store
+    from model import JobAnalysisComplex
+
+    store = JobStore()
+    # Everything is read before anything is written, so no rows change under the open SELECT
+    records = [canonicalize_record(record, LIST_FIELDS) for record in store.analysed_records()]
+    store.update_records(records)
+    print(f"--- Canonicalised tags for {len(records)} stored jobs ---")
+
+    if os.path.exists(DATABASE_FILE):
+        tmp_path = DATABASE_FILE + ".tmp"
+        with open(DATABASE_FILE, "r", encoding="utf-8", newline="") as src, \
+                open(tmp_path, "w", encoding="utf-8", newline="") as dst:
+            reader = csv.DictReader(src)
+            writer = csv.DictWriter(dst, fieldnames=reader.fieldnames, quoting=csv.QUOTE_MINIMAL)
+            writer.writeheader()
+            for row in reader:
+                for field in LIST_FIELDS:
+                    if row.get(field):
+                        row[field] = "; ".join(canonicalize_tags(row[field].split(";")))
+                writer.writerow(row)
+        os.replace(tmp_path, DATABASE_FILE)
+        print(f"--- Canonicalised tags in {DATABASE_FILE} ---")
+
+    if dataset_exists():
+        export_store(store, JobAnalysisComplex)
+
+    # Old counts were keyed on raw spellings, so rebuild rather than fold in
+    update_cube(store, rebuild=True)
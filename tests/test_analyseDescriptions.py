@@ -0,0 +1,61 @@
+import json
+import os
+import pytest
+from analyseDescriptions import JobDescriptionAnalyzer
+from fakeProvider import FakeProvider, build_fake_response
+from jobStore import JobStore
+from metrics import Metrics
+from model import JobAnalysisComplex
+
+JOBS = [{"id": f"job{i}", "title": "Developer", "company": f"Company {i}", "location": "Dublin",
+         "description": f"Posting {i}: Python and SQL."} for i in range(4)]
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Drained queues are archived to data/archive relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "queue.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for job in JOBS:
+            f.write(json.dumps(job) + "\n")
+    return str(path)
+
+
+def make_analyzer(tmp_path, responder=None, **kwargs):
+    return JobDescriptionAnalyzer(client=FakeProvider(latency=(0, 0), responder=responder), use_cache=False,
+                                  verbose=False, metrics=Metrics(json_path=str(tmp_path / "metrics.json")),
+                                  store=JobStore(str(tmp_path / "jobs.sqlite"), migrate=False), **kwargs)
+
+
+def test_limited_run_resumes_from_its_offset(tmp_path, queue):
+    first = make_analyzer(tmp_path, limit=2)
+    first.run_analysis_from_file(queue, str(tmp_path / "out.csv"))
+    assert first.store.counts() == {'analysed': 2}
+    assert os.path.exists(queue)
+
+    second = make_analyzer(tmp_path)
+    second.run_analysis_from_file(queue, str(tmp_path / "out.csv"))
+    assert second.processed_count == 2
+    assert second.store.counts() == {'analysed': 4}
+    # Fully drained: archived, and the offset starts over for the next queue
+    assert not os.path.exists(queue)
+    assert second.store.get_meta(second._offset_key()) == "0"
+
+
+def test_batch_splits_around_a_failing_job(tmp_path, queue):
+    def responder(response_model, messages):
+        if "JOB ID: job2 ===" in messages[-1]["content"]:
+            JobAnalysisComplex.model_validate({})
+        return build_fake_response(response_model, messages)
+
+    analyzer = make_analyzer(tmp_path, responder=responder)
+    analyzer.run_analysis_batched(queue, str(tmp_path / "out.csv"), batch_size=4)
+    assert analyzer.processed_count == 3
+    assert not analyzer.store.is_analysed("job2")
+    assert analyzer.metrics.counter("batch_splits") >= 2
+    # The failed job is retried next run: the offset stays before it and the queue isn't archived
+    assert os.path.exists(queue)
+    with open(queue, "rb") as f:
+        before_failed = len(f.readline()) + len(f.readline())
+    assert int(analyzer.store.get_meta(analyzer._offset_key()) or 0) <= before_failed
@@ -0,0 +1,35 @@
+import pytest
+import extractionCache
+from extractionCache import ExtractionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_get_first_prefers_earlier_keys_and_counts_one_lookup(cache):
+    cache.put("b", {"model": "b"})
+    cache.put("c", {"model": "c"})
+    assert cache.get_first(["a", "c", "b"]) == ("c", {"model": "c"})
+    assert cache.get_first(["x", "y", "z"]) == (None, None)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(extractionCache.time, "time", lambda: next(clock))
+    value = {"text": "x" * 100}
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"), max_bytes=400)
+    cache.put("a", value)
+    cache.put("b", value)
+    cache.put("c", value)
+    # Reading "a" makes "b" the least recently used
+    cache.get("a")
+    cache.put("d", value)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == value for key in ("a", "c", "d"))
+    assert cache.total_bytes <= 400
+    cache.close()
@@ -0,0 +1,36 @@
+import json
+from jobQueue import OffsetTracker, repair_queue, stream_records
+
+
+def write_queue(path, records, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def test_tracker_only_commits_past_contiguous_finished_records():
+    tracker = OffsetTracker(100)
+    assert tracker.done(150, 200) == 100
+    assert tracker.done(200, 260) == 100
+    assert tracker.done(100, 150) == 260
+    assert tracker.finished == {}
+
+
+def test_stream_resumes_from_a_committed_offset(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    write_queue(path, [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    spans = list(stream_records(str(path)))
+    assert [record["id"] for _, _, record in spans] == ["a", "b", "c"]
+
+    tracker = OffsetTracker()
+    tracker.done(*spans[0][:2])
+    resumed = list(stream_records(str(path), tracker.committed))
+    assert [record["id"] for _, _, record in resumed] == ["b", "c"]
+
+
+def test_repair_drops_a_torn_last_line(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    write_queue(path, [{"id": "a"}], tail='{"id": "b", "desc')
+    assert repair_queue(str(path)) > 0
+    assert [record["id"] for _, _, record in stream_records(str(path))] == ["a"]
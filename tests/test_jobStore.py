@@ -0,0 +1,137 @@
+import csv
+import json
+import pytest
+from jobStore import JobStore
+from trends import annual_salary
+
+FIELDS = ['id', 'title', 'company', 'location', 'languages', 'min_years_experience', 'salary_range', 'salary']
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"), migrate=False)
+    yield store
+    store.close()
+
+
+def migrate_rows(store, tmp_path, rows):
+    """Writes rows the way _save_to_csv does (lists joined, salary as its repr) and migrates them."""
+    database_file = tmp_path / "jobs.csv"
+    with open(database_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({field: "; ".join(value) if isinstance(value, list) else value
+                             for field, value in row.items()})
+    store.migrate_from_files(queue_file=str(tmp_path / "queue.jsonl"), database_file=str(database_file),
+                             archive_dir=str(tmp_path / "archive"))
+    return {record['id']: record for record in store.analysed_records()}
+
+
+def test_migration_restores_types(store, tmp_path):
+    salary = {'min_amount': 50000.0, 'max_amount': 60000.0, 'currency': 'EUR', 'interval': 'yearly'}
+    records = migrate_rows(store, tmp_path, [{
+        'id': 'a', 'title': 'Developer', 'company': 'Acme', 'location': 'Dublin',
+        'languages': ['python', 'go'], 'min_years_experience': 3, 'salary_range': '50k-60k', 'salary': salary,
+    }])
+    record = records['a']
+    assert record['languages'] == ['python', 'go']
+    assert record['min_years_experience'] == 3
+    assert record['salary'] == salary
+    assert annual_salary(record['salary']) == 55000.0
+
+
+@pytest.mark.parametrize("years, salary", [
+    ("", ""),
+    ("a few", "not a dict"),
+    ("2.0", "None"),
+])
+def test_migration_drops_unusable_values(store, tmp_path, years, salary):
+    records = migrate_rows(store, tmp_path, [{'id': 'b', 'title': 'Developer', 'languages': [],
+                                              'min_years_experience': years, 'salary': salary}])
+    record = records['b']
+    assert record['languages'] == []
+    assert record['min_years_experience'] == (2 if years == "2.0" else None)
+    assert record['salary'] is None
+
+
+def test_migration_is_recorded(store, tmp_path):
+    migrate_rows(store, tmp_path, [{'id': 'c', 'title': 'Developer'}])
+    assert store.get_meta("migrated") is not None
+    assert store.counts() == {'analysed': 1}
+
+
+def test_stores_migrated_as_text_are_repaired(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path, migrate=False)
+    store.mark_analysed([{'id': 'd', 'min_years_experience': '5', 'salary': "{'min_amount': 40000.0}"}])
+    for key in ("migrated", "descriptions_backfilled", "seen_backfilled"):
+        store.set_meta(key, 0)
+    store.close()
+
+    store = JobStore(path)
+    record = next(store.analysed_records())
+    store.close()
+    assert record['min_years_experience'] == 5
+    assert record['salary'] == {'min_amount': 40000.0}
+
+
+def write_archive(archive_dir, name, ids):
+    archive_dir.mkdir(exist_ok=True)
+    with open(archive_dir / name, "w", encoding="utf-8") as f:
+        for job_id in ids:
+            f.write(json.dumps({"id": job_id, "description": f"Posting {job_id}"}) + "\n")
+
+
+def test_backfill_counts_jobs_it_redated(store, tmp_path):
+    archive_dir = tmp_path / "archive"
+    write_archive(archive_dir, "processed_queue_2025-01-06_09-00.jsonl", ["a", "b", "not-stored"])
+    write_archive(archive_dir, "processed_queue_2025-01-13_09-00.jsonl", ["a"])
+    store.mark_analysed([{'id': 'a'}, {'id': 'b'}])
+
+    assert store.backfill_seen_times(str(archive_dir)) == 2
+    first_seen, last_seen = store.conn.execute("SELECT first_seen, last_seen FROM jobs WHERE id = 'a'").fetchone()
+    assert last_seen - first_seen == 7 * 24 * 3600
+    # Nothing left to move
+    assert store.backfill_seen_times(str(archive_dir)) == 0
+
+
+def test_migration_dates_jobs_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_archive(tmp_path / "archive", "processed_queue_2025-01-06_09-00.jsonl", ["a"])
+    store = JobStore(str(tmp_path / "jobs.sqlite"), migrate=False)
+    migrate_rows(store, tmp_path, [{'id': 'a', 'title': 'Developer'}])
+    store.set_meta("tag_cube_watermark", 1)
+    assert store.get_meta("seen_backfilled") is not None
+    store.close()
+
+    # Reopening doesn't date (and reset the aggregates) a second time
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    assert store.get_meta("tag_cube_watermark") == "1"
+    store.close()
+
+
+def test_offsets_survive_reopening_and_only_watermarks_reset(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path, migrate=False)
+    store.set_meta("queue_offset:/data/raw/queue.jsonl", 4096)
+    store.set_meta("tag_cube_watermark", 1.5)
+    store.set_meta("trends_watermark", 1.5)
+    store.set_meta("nowatermark", 1)
+    store.close()
+
+    store = JobStore(path, migrate=False)
+    assert store.get_meta("queue_offset:/data/raw/queue.jsonl") == "4096"
+    store.reset_watermarks()
+    assert store.get_meta("tag_cube_watermark") is None
+    assert store.get_meta("trends_watermark") is None
+    assert store.get_meta("nowatermark") == "1"
+    assert store.get_meta("queue_offset:/data/raw/queue.jsonl") == "4096"
+    store.close()
+
+
+def test_analysed_since_follows_the_watermark(store):
+    store.mark_analysed([{'id': 'a'}])
+    (_, _, watermark), = store.analysed_since(0)
+    store.mark_analysed([{'id': 'b'}])
+    assert [record['id'] for record, _, _ in store.analysed_since(watermark)] == ['b']
@@ -0,0 +1,88 @@
+import pytest
+import providerPool
+from providerPool import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(providerPool.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.record_failure(breaker.before_call())
+
+
+def test_opens_after_threshold_failures_in_a_row(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    fail(breaker, 2)
+    breaker.record_success(breaker.before_call())
+    fail(breaker, 2)
+    assert breaker.state == "closed"
+    fail(breaker, 1)
+    assert breaker.state == "open" and not breaker.allows()
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    fail(breaker, 1)
+    clock.now += 30
+    assert breaker.state == "half-open" and breaker.allows()
+    started = breaker.before_call()
+    assert not breaker.allows()
+    clock.now += 1
+    breaker.record_success(started)
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    fail(breaker, 1)
+    clock.now += 30
+    assert breaker.record_failure(breaker.before_call())
+    assert breaker.state == "open"
+    assert breaker.retry_in() == 30
+
+
+def test_calls_from_before_it_opened_dont_close_it(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=30)
+    in_flight = [breaker.before_call() for _ in range(4)]
+    clock.now += 1
+    assert not breaker.record_failure(in_flight[0])
+    assert breaker.record_failure(in_flight[1])
+    # A slow call that started while it was still closed succeeds, another fails
+    breaker.record_success(in_flight[2])
+    assert not breaker.record_failure(in_flight[3])
+    assert breaker.state == "open"
+    assert breaker.retry_in() == 30
+
+
+def test_calls_from_before_it_closed_dont_reopen_it(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    stale = breaker.before_call()
+    clock.now += 1
+    fail(breaker, 1)
+    clock.now += 30
+    trial = breaker.before_call()
+    clock.now += 1
+    breaker.record_success(trial)
+    assert not breaker.record_failure(stale)
+    assert breaker.state == "closed"
+
+
+def test_rate_limited_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    fail(breaker, 1)
+    clock.now += 30
+    breaker.release(breaker.before_call())
+    assert breaker.state == "half-open" and breaker.allows()
@@ -0,0 +1,13 @@
+import os
+from jobStore import JobStore, STORE_FILE
+from tagStats import CUBE_FILE, file_for_store, update_cube
+
+
+def test_other_stores_get_their_own_cube(tmp_path):
+    assert file_for_store(STORE_FILE, CUBE_FILE) == CUBE_FILE
+    store = JobStore(str(tmp_path / "other.sqlite"), migrate=False)
+    store.mark_analysed([{'id': 'a', 'languages': ['python'], 'seniority_level': 'Mid', 'work_setting': 'Remote'}])
+    cube = update_cube(store)
+    store.close()
+    assert os.path.exists(tmp_path / "other_tag_stats.parquet")
+    assert cube.loc[cube['tag'] == 'python', 'count'].sum() == 1
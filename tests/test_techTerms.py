@@ -0,0 +1,43 @@
+import pytest
+from techTerms import TermIndex, canonicalize_tags
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TermIndex()
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("React.js", "react"),
+    ("NodeJS", "node.js"),
+    ("Tailwind", "tailwind css"),
+    ("springboot", "spring boot"),
+    ("ror", "ruby on rails"),
+])
+def test_aliases(index, tag, expected):
+    assert index.canonical(tag) == expected
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("javascrpt", "javascript"),
+    ("kubernets", "kubernetes"),
+    ("postgressql", "postgresql"),
+    ("elasticsearh", "elasticsearch"),
+])
+def test_typos_in_long_names_are_fixed(index, tag, expected):
+    assert index.canonical(tag) == expected
+
+
+@pytest.mark.parametrize("tag", ["flash", "sigma", "nodes", "grails", "sveltekit", "spring", "rails"])
+def test_lookalikes_keep_their_own_tag(index, tag):
+    assert index.canonical(tag) == tag
+
+
+def test_short_names_are_never_fuzzy_matched(index):
+    # One edit from 'flask'/'figma', but too short to tell a typo from a different word
+    assert index.fuzzy_match("flaks") is None
+    assert index.fuzzy_match("figmo") is None
+
+
+def test_canonicalize_tags_dedupes_in_order():
+    assert canonicalize_tags(["ReactJS", "react", "Grails", "", "Spring"]) == ["react", "grails", "spring"]
@@ -0,0 +1,215 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from config import DATABASE_FILE
+from jobStore import JobStore
+from tagStats import file_for_store, records_frame, update_cube, week_of
+
+TRENDS_FILE = os.path.join(os.path.dirname(DATABASE_FILE), "trends.parquet")
+WATERMARK_KEY = "trends_watermark"
+DIMENSIONS = ['week', 'seniority_level', 'work_setting', 'currency', 'salary_bucket']
+# Salaries are counted in log-spaced buckets 5% wide, so weeks can be added together and a
+# percentile read back off the summed buckets to within ~2.5%
+SALARY_BUCKET_RATIO = 1.05
+NO_SALARY = -1
+# Rough working hours/months in a year, to put hourly and monthly rates on a yearly footing
+HOURS_PER_YEAR = 1950
+ROLLING_WEEKS = 4
+
+
+def annual_salary(salary) -> float:
+    """Midpoint of a structured salary, as a yearly figure. None if there isn't a usable one."""
+    if not isinstance(salary, dict):
+        return None
+    amounts = [amount for amount in (salary.get('min_amount'), salary.get('max_amount')) if amount]
+    if not amounts:
+        return None
+    value = sum(amounts) / len(amounts)
+    interval = salary.get('interval')
+    if interval == "hourly":
+        value *= HOURS_PER_YEAR
+    elif interval == "monthly":
+        value *= 12
+    return value if value > 0 else None
+
+
+def salary_bucket(value) -> int:
+    if value is None or not value > 0:
+        return NO_SALARY
+    return int(math.floor(math.log(value) / math.log(SALARY_BUCKET_RATIO)))
+
+
+def bucket_value(bucket) -> float:
+    """Geometric middle of a salary bucket."""
+    return SALARY_BUCKET_RATIO ** (bucket + 0.5)
+
+
+def count_jobs(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates a jobs frame (with a week column) into job counts per week, seniority, setting and salary bucket."""
+    if df.empty:
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    salaries = df['salary'] if 'salary' in df else pd.Series(None, index=df.index, dtype=object)
+    rows = pd.DataFrame({
+        'week': df['week'],
+        'seniority_level': df.get('seniority_level', pd.Series("Unknown", index=df.index)).fillna("Unknown"),
+        'work_setting': df.get('work_setting', pd.Series("Unknown", index=df.index)).fillna("Unknown"),
+        'currency': salaries.map(lambda s: (s.get('currency') or "Unknown") if isinstance(s, dict) else "Unknown"),
+        'salary_bucket': salaries.map(lambda s: salary_bucket(annual_salary(s))),
+    })
+    return rows.groupby(DIMENSIONS, observed=True).size().reset_index(name='count')
+
+
+def merge_counts(*frames) -> pd.DataFrame:
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.groupby(DIMENSIONS, observed=True)['count'].sum().reset_index()
+
+
+def load_trends(path: str = TRENDS_FILE) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=DIMENSIONS + ['count'])
+    return pd.read_parquet(path)
+
+
+def update_trends(store: JobStore = None, path: str = None, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Folds jobs analysed since the last update into the weekly aggregate and saves it, the same way
+    the tag cube is kept up to date. Weeks are the week a job was first seen.
+    """
+    store = store or JobStore()
+    path = path or file_for_store(store.path, TRENDS_FILE)
+    watermark = store.get_meta(WATERMARK_KEY)
+    rebuild = rebuild or watermark is None
+    watermark = 0.0 if rebuild else float(watermark)
+    counts = None if rebuild else load_trends(path)
+
+    rows = list(store.analysed_since(watermark))
+    if not rows and counts is not None and os.path.exists(path):
+        return counts
+    counts = merge_counts(counts, count_jobs(records_frame(rows)))
+    trends_dir = os.path.dirname(path)
+    if trends_dir:
+        os.makedirs(trends_dir, exist_ok=True)
+    counts.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    if rows:
+        store.set_meta(WATERMARK_KEY, rows[-1][2])
+    print(f"--- Trends: folded in {len(rows)} jobs, {len(counts)} rows stored ---")
+    return counts
+
+
+def update_aggregates(store: JobStore = None, rebuild: bool = False):
+    """Brings the tag cube and the weekly trends up to date together. Returns (cube, counts)."""
+    store = store or JobStore()
+    return update_cube(store, rebuild=rebuild), update_trends(store, rebuild=rebuild)
+
+
+def _weekly(frame: pd.DataFrame, index, columns, values='count') -> pd.DataFrame:
+    """Pivot to one row per week, with weeks nobody was scraped filled in as 0 so windows stay in step."""
+    frame = frame[frame['week'] != "Unknown"]
+    if frame.empty:
+        return pd.DataFrame()
+    table = frame.pivot_table(index=index, columns=columns, values=values, aggfunc='sum', fill_value=0)
+    table.index = pd.to_datetime(table.index)
+    weeks = pd.date_range(table.index.min(), table.index.max(), freq="W-MON")
+    return table.reindex(weeks, fill_value=0)
+
+
+def jobs_per_week(counts: pd.DataFrame) -> pd.Series:
+    weekly = _weekly(counts.assign(all="jobs"), 'week', 'all')
+    return weekly['jobs'] if not weekly.empty else pd.Series(dtype='int64')
+
+
+def tech_demand(cube: pd.DataFrame, counts: pd.DataFrame, tags=None, field: str = None,
+                window: int = ROLLING_WEEKS, top: int = 8) -> pd.DataFrame:
+    """
+    Share of postings asking for each tag, per week, smoothed over a rolling `window` of weeks
+    (summed counts over summed jobs, so quiet weeks don't swing it). Defaults to the `top` tags overall.
+    """
+    subset = cube if field is None else cube[cube['field'] == field]
+    if tags is None:
+        tags = list(subset.groupby('tag')['count'].sum().astype('int64').nlargest(top).index)
+    subset = subset[subset['tag'].isin(tags)]
+    weekly = _weekly(subset, 'week', 'tag')
+    jobs = jobs_per_week(counts)
+    if weekly.empty or jobs.empty:
+        return pd.DataFrame(columns=tags)
+    weeks = weekly.index.union(jobs.index)
+    tag_sums = weekly.reindex(weeks, fill_value=0).rolling(window, min_periods=1).sum()
+    job_sums = jobs.reindex(weeks, fill_value=0).rolling(window, min_periods=1).sum()
+    return tag_sums.div(job_sums.replace(0, np.nan), axis=0)
+
+
+def salary_percentiles(counts: pd.DataFrame, quantiles=(0.25, 0.5, 0.75), window: int = ROLLING_WEEKS,
+                       currency: str = "EUR", by: str = 'seniority_level') -> pd.DataFrame:
+    """
+    Yearly salary percentiles per week and `by` group, over a rolling `window` of weeks.
+    Read off the summed salary buckets, so no individual salaries need to be kept.
+    """
+    subset = counts[(counts['salary_bucket'] != NO_SALARY) & (counts['currency'] == currency)]
+    results = []
+    for group, rows in subset.groupby(by):
+        weekly = _weekly(rows, 'week', 'salary_bucket')
+        if weekly.empty:
+            continue
+        window_counts = weekly.rolling(window, min_periods=1).sum()
+        buckets = np.array([bucket_value(bucket) for bucket in weekly.columns])
+        cumulative = window_counts.to_numpy().cumsum(axis=1)
+        totals = cumulative[:, -1]
+        frame = pd.DataFrame({'week': weekly.index, by: group, 'salaries': totals})
+        for q in quantiles:
+            # First bucket whose running count reaches the quantile
+            positions = (cumulative < (totals * q)[:, None]).sum(axis=1).clip(max=len(buckets) - 1)
+            frame[f"p{int(q * 100)}"] = np.where(totals > 0, buckets[positions], np.nan)
+        results.append(frame)
+    if not results:
+        return pd.DataFrame(columns=['week', by, 'salaries'] + [f"p{int(q * 100)}" for q in quantiles])
+    return pd.concat(results, ignore_index=True)
+
+
+def remote_share(counts: pd.DataFrame, window: int = ROLLING_WEEKS) -> pd.DataFrame:
+    """Share of postings per work setting, per week, over a rolling `window` of weeks."""
+    weekly = _weekly(counts, 'week', 'work_setting')
+    if weekly.empty:
+        return weekly
+    rolled = weekly.rolling(window, min_periods=1).sum()
+    return rolled.div(rolled.sum(axis=1).replace(0, np.nan), axis=0)
+
+
+def open_postings(store: JobStore) -> pd.Series:
+    """
+    Postings still up per week: seen first on or before that week and last seen on or after it.
+    Counted with a running sum over week offsets rather than a check per job per week.
+    """
+    spans = np.array(store.conn.execute(
+        "SELECT first_seen, COALESCE(last_seen, first_seen) FROM jobs "
+        "WHERE first_seen IS NOT NULL AND duplicate_of IS NULL").fetchall(), dtype=float)
+    if not len(spans):
+        return pd.Series(dtype='int64')
+    start_week = pd.Timestamp(week_of(spans[:, 0].min()))
+    week_seconds = 7 * 86400
+    first = ((spans[:, 0] - start_week.timestamp()) // week_seconds).astype(int)
+    last = ((spans[:, 1] - start_week.timestamp()) // week_seconds).astype(int)
+    changes = np.zeros(last.max() + 2, dtype=np.int64)
+    np.add.at(changes, first, 1)
+    np.add.at(changes, last + 1, -1)
+    return pd.Series(changes.cumsum()[:-1], index=pd.date_range(start_week, periods=len(changes) - 1, freq="W-MON"))
+
+
+if __name__ == "__main__":
+    import time
+    store = JobStore()
+    cube, counts = update_aggregates(store)
+    started = time.perf_counter()
+    demand = tech_demand(cube, counts, field='languages')
+    salaries = salary_percentiles(counts)
+    remote = remote_share(counts)
+    open_jobs = open_postings(store)
+    print(f"--- Trend queries over {len(counts)} aggregate rows took {time.perf_counter() - started:.3f}s ---")
+    print(f"\nLanguage demand (share of postings, {ROLLING_WEEKS}-week rolling):\n{demand.tail(8).round(3).to_string()}")
+    print(f"\nSalary percentiles (EUR/year):\n{salaries.tail(8).to_string(index=False, float_format='%.0f')}")
+    print(f"\nWork setting share:\n{remote.tail(8).round(3).to_string()}")
+    print(f"\nOpen postings:\n{open_jobs.tail(8).to_string()}")
@@ -1,60 +1,129 @@
+import os
 import pandas as pd
+import matplotlib
+# Headless: reports are written to assets/ rather than shown in a window
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from collections import Counter
 from config import DATABASE_FILE
+from jobStore import JobStore, STORE_FILE, LIST_FIELDS
+from tagStats import update_cube, cube_from_csv, cube_from_dataset, top_tags
+from jobDataset import read_columns
+from trends import update_aggregates, tech_demand, salary_percentiles, remote_share, open_postings, ROLLING_WEEKS
 import seaborn as sns
 
-def getNameValuePairs():
-    df = pd.read_csv(DATABASE_FILE)
+ASSETS_DIR = "assets"
 
-    for field in ['languages', 'frameworks', 'tools', 'cloud_platforms', 'domain_knowledge']:
-        allEntries = []
-        for entry in df[field].dropna():
-            allEntries.extend([s.strip().lower() for s in str(entry).split(';')])
-    
-        # Plot the top 10
-        counts = Counter(allEntries).most_common(10)
-        names, values = zip(*counts)
-        return names, values
-        
-def generate_reports(csv_path: str):
-    df = pd.read_csv(csv_path)
-
-    for field in ['languages', 'frameworks', 'tools', 'cloud_platforms', 'domain_knowledge']:
-        allEntries = []
-        for entry in df[field].dropna():
-            allEntries.extend([s.strip().lower() for s in str(entry).split(';')])
-    
+def load_database(source=DATABASE_FILE, columns=None):
+    """
+    Reads the jobs database from a CSV, straight from the job store if given a .sqlite path,
+    or from the Parquet dataset if given its directory (only `columns` are read, lists intact).
+    """
+    if os.path.isdir(str(source)):
+        return read_columns(source, columns)
+    if str(source).endswith(".sqlite"):
+        rows = []
+        for record in JobStore(source).analysed_records():
+            for field in LIST_FIELDS:
+                if isinstance(record.get(field), list):
+                    record[field] = "; ".join(record[field])
+            rows.append(record)
+        return pd.DataFrame(rows)
+    return pd.read_csv(source, usecols=lambda column: columns is None or column in columns)
+
+def load_cube_for(source=STORE_FILE):
+    """The precomputed tag counts: brought up to date from the job store, or built from a CSV or Parquet dataset."""
+    if str(source).endswith(".sqlite"):
+        # Kept next to that store, so another store's jobs never land in the main cube
+        return update_cube(JobStore(source))
+    if os.path.isdir(str(source)):
+        return cube_from_dataset(source)
+    return cube_from_csv(source)
+
+def _save_figure(name, output_dir, formats):
+    os.makedirs(output_dir, exist_ok=True)
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        plt.savefig(path, bbox_inches="tight")
+        print(f"--- Saved {path} ---")
+    plt.close()
+
+def getNameValuePairs(field='languages', source=STORE_FILE):
+    counts = top_tags(load_cube_for(source), field)
+    return tuple(counts.index), tuple(int(v) for v in counts.values)
+
+def generate_reports(csv_path: str, output_dir=ASSETS_DIR, formats=("png",)):
+    cube = load_cube_for(csv_path)
+
+    for field in LIST_FIELDS:
         # Plot the top 10
-        counts = Counter(allEntries).most_common(10)
-        names, values = zip(*counts)
+        counts = top_tags(cube, field)
+        if counts.empty:
+            continue
 
-        plt.barh(names, values, color='skyblue')
+        plt.figure()
+        plt.barh(counts.index, counts.values, color='skyblue')
         plt.title("Most Demanded " + field.capitalize() + " in My Scrape")
         plt.xlabel("Number of Job Posts")
-        plt.show()
-        
-def generate_polished_reports(df):
+        _save_figure(f"{field}_demanded", output_dir, formats)
+
+def generate_polished_reports(df, output_dir=ASSETS_DIR, formats=("png", "svg")):
     # Set a professional theme
     sns.set_theme(style="whitegrid")
-    df = pd.read_csv(df)
-    for field in ['languages', 'frameworks', 'tools', 'cloud_platforms', 'domain_knowledge']:
-        allEntries = []
-        for entry in df[field].dropna():
-            allEntries.extend([s.strip().lower() for s in str(entry).split(';')])
-    
+    cube = load_cube_for(df)
+    for field in LIST_FIELDS:
         # Plot the top 10
-        counts = Counter(allEntries).most_common(10)
-        names, values = zip(*counts)
-        
+        counts = top_tags(cube, field)
+        if counts.empty:
+            continue
+        names, values = list(counts.index), list(counts.values)
+
         plt.figure(figsize=(10, 6))
-        ax = sns.barplot(x=values, y=names, palette="viridis")
-        
+        sns.barplot(x=values, y=names, hue=names, palette="viridis", legend=False)
+
         plt.title(f"Top 10 {field.capitalize()}", fontsize=15)
         plt.xlabel("Frequency", fontsize=12)
         plt.ylabel("")
         sns.despine(left=True, bottom=True)
-        plt.show()
+        _save_figure(f"{field}_mentioned", output_dir, formats)
+
+def generate_trend_reports(source=STORE_FILE, output_dir=ASSETS_DIR, formats=("png",), window=ROLLING_WEEKS):
+    """Line charts of the weekly trends (see trends.py): tech demand, salaries, work setting and open postings."""
+    sns.set_theme(style="whitegrid")
+    store = JobStore(source)
+    cube, counts = update_aggregates(store)
+
+    for field in ('languages', 'frameworks'):
+        demand = tech_demand(cube, counts, field=field, window=window)
+        if demand.empty:
+            continue
+        (demand * 100).plot(figsize=(10, 6))
+        plt.title(f"{field.capitalize()} demand, {window}-week rolling", fontsize=15)
+        plt.ylabel("% of postings")
+        _save_figure(f"{field}_trend", output_dir, formats)
+
+    salaries = salary_percentiles(counts, window=window)
+    if not salaries.empty:
+        plt.figure(figsize=(10, 6))
+        for level, rows in salaries.groupby('seniority_level'):
+            line = plt.plot(rows['week'], rows['p50'], label=level)[0]
+            plt.fill_between(rows['week'], rows['p25'], rows['p75'], color=line.get_color(), alpha=0.15)
+        plt.title(f"Median salary (EUR/year) by seniority, {window}-week rolling", fontsize=15)
+        plt.legend()
+        _save_figure("salary_trend", output_dir, formats)
+
+    remote = remote_share(counts, window=window)
+    if not remote.empty:
+        (remote * 100).plot.area(figsize=(10, 6))
+        plt.title(f"Work setting, {window}-week rolling", fontsize=15)
+        plt.ylabel("% of postings")
+        _save_figure("work_setting_trend", output_dir, formats)
+
+    open_jobs = open_postings(store)
+    if not open_jobs.empty:
+        open_jobs.plot(figsize=(10, 6))
+        plt.title("Open postings per week", fontsize=15)
+        _save_figure("open_postings_trend", output_dir, formats)
 
 if __name__ == "__main__":
-    generate_polished_reports(DATABASE_FILE)
\ No newline at end of file
+    generate_polished_reports(STORE_FILE)
+    generate_trend_reports(STORE_FILE)